@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+from hashlib import sha1
+from flask import Blueprint, Response, abort, current_app, request, url_for
+from cache import MemoryBackend, venue_key, artist_key
+from profiler import timed
+from budgets import budget
+from models import Venue, Artist, Show, db
+from replicas import served_from_replica
+from enums import Genre, State
+from queries import (
+  keyset_page, show_listing_statement, decode_cursor, genre_filter, location_filter, slot_conflicts
+)
+try:
+  import orjson
+
+  def dumps(data):
+    return orjson.dumps(data)
+except ImportError:
+  import json
+
+  def dumps(data):
+    return json.dumps(data, separators=(',', ':'), default=str).encode()
+#----------------------------------------------------------------------------#
+# Read-only JSON API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# ETags of the responses sent so far, so that a matching If-None-Match is
+# answered with 304 before any query runs. Venue and artist records are keyed
+# like their pages and forgotten with them; lists and shows are forgotten on
+# every write. Only used with INVALIDATION_BUS on: otherwise a worker would
+# not hear of writes handled by the others and keep answering 304 for data
+# that has changed.
+def init_app(app):
+  app.extensions['record_etags'] = MemoryBackend(maxsize=4096, ttl=300)
+  app.extensions['list_etags'] = MemoryBackend(maxsize=1024, ttl=60)
+
+def record_etags():
+  return current_app.extensions['record_etags']
+
+def list_etags():
+  return current_app.extensions['list_etags']
+
+VENUE_FIELDS = ('id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                'facebook_link', 'website_link', 'seeking_talent', 'seeking_description')
+ARTIST_FIELDS = ('id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website_link', 'seeking_venue', 'seeking_description')
+
+def forget(*keys):
+  """Drop the ETags of the given record keys and of every list."""
+  record_etags().delete(*keys)
+  list_etags().clear()
+
+def forget_all():
+  record_etags().clear()
+  list_etags().clear()
+
+def conditional(etags, key, build):
+  """Answer with the JSON of build(), or 304 if the client already has it."""
+  shortcut = current_app.config.get('INVALIDATION_BUS')
+  etag = etags.get(key) if shortcut else None
+  if etag is not None and request.if_none_match.contains(etag):
+    return not_modified(etag)
+  data = build()
+  with timed('serialize'):
+    body = dumps(data)
+  etag = sha1(body).hexdigest()
+  # an ETag of a lagging replica's data could answer 304 to a client
+  # holding newer data; only the primary's are remembered
+  if shortcut and not served_from_replica():
+    etags.set(key, etag)
+  if request.if_none_match.contains(etag):
+    return not_modified(etag)
+  response = Response(body, mimetype='application/json')
+  response.set_etag(etag)
+  return response
+
+def not_modified(etag):
+  response = Response(status=304)
+  response.set_etag(etag)
+  return response
+
+def page_limit():
+  try:
+    return min(max(int(request.args.get('limit', 50)), 1), 500)
+  except ValueError:
+    abort(400)
+
+def id_listing(model, fields, endpoint):
+  limit = page_limit()
+  genres = request.args.getlist('genre')
+  state = request.args.get('state', '').upper() or None
+  city = request.args.get('city') or None
+  if not set(genres).issubset(Genre.__members__) or (state and state not in State.__members__):
+    abort(400)
+  query = db.session.query(*[getattr(model, field) for field in fields])\
+    .filter(genre_filter(model, genres, request.args.get('match') == 'any'),
+            location_filter(model, state, city))\
+    .order_by(model.id)
+  after = request.args.get('after', type=int)
+  if after is not None:
+    query = query.filter(model.id > after)
+  rows = query.limit(limit + 1).all()
+  next_url = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_url = url_for(endpoint, after=rows[-1].id, limit=limit,
+                       genre=genres, match=request.args.get('match'), state=state, city=city)
+  return {'data': [dict(zip(fields, row)) for row in rows], 'next': next_url}
+
+def record(model, fields, id):
+  row = db.session.query(*[getattr(model, field) for field in fields])\
+    .filter(model.id == id).first_or_404()
+  return {'data': dict(zip(fields, row))}
+
+@api.route('/venues')
+@budget(1)
+@db.read_only
+def venues():
+  return conditional(list_etags(), request.full_path,
+    lambda: id_listing(Venue, ('id', 'name', 'city', 'state'), 'api.venues'))
+
+@api.route('/venues/<int:venue_id>')
+@budget(1)
+@db.read_only
+def venue(venue_id):
+  return conditional(record_etags(), venue_key(venue_id),
+    lambda: record(Venue, VENUE_FIELDS, venue_id))
+
+@api.route('/artists')
+@budget(1)
+@db.read_only
+def artists():
+  return conditional(list_etags(), request.full_path,
+    lambda: id_listing(Artist, ('id', 'name', 'city', 'state'), 'api.artists'))
+
+@api.route('/artists/<int:artist_id>')
+@budget(1)
+@db.read_only
+def artist(artist_id):
+  return conditional(record_etags(), artist_key(artist_id),
+    lambda: record(Artist, ARTIST_FIELDS, artist_id))
+
+def show_item(row):
+  return {
+    'id': row.id,
+    'start_time': row.start_time.isoformat(),
+    'end_time': row.end_time.isoformat(),
+    'venue_id': row.venue_id,
+    'venue_name': row.venue_name,
+    'artist_id': row.artist_id,
+    'artist_name': row.artist_name,
+    'artist_image_link': row.image_link,
+  }
+
+def show_listing():
+  limit = page_limit()
+  cursor = None
+  if 'after' in request.args:
+    try:
+      cursor = decode_cursor(request.args['after'])
+    except ValueError:
+      abort(400)
+  rows, next_cursor = keyset_page(show_listing_statement(), limit, cursor)
+  return {
+    'data': [show_item(row) for row in rows],
+    'next': next_cursor and url_for('api.shows', after=next_cursor, limit=limit),
+  }
+
+@api.route('/shows')
+@budget(1)
+@db.read_only
+def shows():
+  return conditional(list_etags(), request.full_path, show_listing)
+
+@api.route('/shows/<int:show_id>')
+@budget(1)
+@db.read_only
+def show(show_id):
+  return conditional(list_etags(), f'show:{show_id}',
+    lambda: {'data': show_item(
+      db.session.execute(show_listing_statement().where(Show.id == show_id)).first() or abort(404))})
+
+@api.route('/availability')
+@budget(1)
+def availability():
+  # ?venue_id=&artist_id=&start=2030-05-21T21:30&duration=120 (minutes); read
+  # from the primary, as a replica may not have the latest bookings yet
+  venue_id = request.args.get('venue_id', type=int)
+  artist_id = request.args.get('artist_id', type=int)
+  try:
+    start = datetime.fromisoformat(request.args['start'])
+    duration = int(request.args.get('duration', 120))
+  except (KeyError, ValueError):
+    abort(400)
+  if (venue_id is None and artist_id is None) or not 1 <= duration <= 24 * 60:
+    abort(400)
+  end = start + timedelta(minutes=duration)
+  conflicts = slot_conflicts(start, end, venue_id, artist_id)
+  response = Response(dumps({
+    'available': not conflicts,
+    'start_time': start.isoformat(),
+    'end_time': end.isoformat(),
+    'conflicts': [{
+      'id': row.id,
+      'venue_id': row.venue_id,
+      'artist_id': row.artist_id,
+      'start_time': row.start_time.isoformat(),
+      'end_time': row.end_time.isoformat(),
+    } for row in conflicts],
+  }), mimetype='application/json')
+  response.headers['Cache-Control'] = 'no-store'
+  return response
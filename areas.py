@@ -0,0 +1,70 @@
+from itertools import groupby
+from threading import Lock
+#----------------------------------------------------------------------------#
+# Venue areas.
+#----------------------------------------------------------------------------#
+
+def group_areas(rows):
+  """Fold (city, state, id, name) rows, ordered by area, into the /venues listing."""
+  return list(iter_areas(rows))
+
+def iter_areas(rows):
+  """Like group_areas(), but yields one area at a time so rows can be streamed."""
+  for (city, state), group in groupby(rows, key=lambda row: (row[0], row[1])):
+    yield {
+      "city": city,
+      "state": state,
+      "venues": [{"id": id, "name": name} for _, _, id, name in group]
+    }
+
+
+class AreaIndex:
+  """In-process index of venues by (city, state).
+
+  Loaded with a single query on first use and kept current by the venue
+  create/edit/delete handlers, so the /venues page costs no queries at all
+  once warm, however many areas there are.
+  """
+
+  def __init__(self):
+    self._lock = Lock()
+    self._venues = None
+    self._listing = None
+
+  def listing(self, load):
+    """Return the areas listing, calling load() for the rows if the index is cold."""
+    with self._lock:
+      if self._venues is None:
+        self._venues = {id: (city, state, name) for city, state, id, name in load()}
+        self._listing = None
+      return self._current_listing()
+
+  def warm_listing(self):
+    """The areas listing if the index is loaded, else None; never loads it."""
+    with self._lock:
+      return self._current_listing() if self._venues is not None else None
+
+  def _current_listing(self):
+    if self._listing is None:
+      rows = sorted(
+        ((city, state, id, name) for id, (city, state, name) in self._venues.items()),
+        key=lambda row: (row[1], row[0], row[2])
+      )
+      self._listing = group_areas(rows)
+    return self._listing
+
+  def put(self, id, name, city, state):
+    with self._lock:
+      if self._venues is not None:
+        self._venues[id] = (city, state, name)
+        self._listing = None
+
+  def remove(self, id):
+    with self._lock:
+      if self._venues is not None and self._venues.pop(id, None) is not None:
+        self._listing = None
+
+  def invalidate(self):
+    with self._lock:
+      self._venues = None
+      self._listing = None
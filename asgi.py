@@ -0,0 +1,245 @@
+"""ASGI entry point: uvicorn asgi:app
+
+The read-heavy pages are served here with SQLAlchemy's asyncio engine on
+asyncpg, running independent queries of a page concurrently. Every other
+request -- forms, writes, search, the API -- goes to the Flask app through
+a2wsgi. Routing, templates and helpers are the Flask app's own, so both
+entry points serve the same site.
+
+The Flask request hooks do not run for the pages served here: their reads
+go to the primary database, not the replicas, and they are neither
+profiled (PROFILE_REQUESTS) nor held to query budgets (QUERY_BUDGETS). The
+invalidation listener is started at lifespan startup instead.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from a2wsgi import WSGIMiddleware
+from flask import abort, render_template, request, session, url_for
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from werkzeug.exceptions import HTTPException
+import pages
+from app import create_app
+from areas import group_areas
+from cache import venue_key, artist_key
+from models import Venue, Artist, db, load_profile
+from queries import (
+  show_counts_statement, venue_shows_statement, venue_show_items,
+  artist_shows_statement, artist_show_items, show_listing_statement, show_listing_item,
+  keyset_statement, keyset_result, genre_filter, genre_facets_statement, genre_facet_items,
+  location_filter, venue_area_statement
+)
+#----------------------------------------------------------------------------#
+# Async engine.
+#----------------------------------------------------------------------------#
+
+flask_app = create_app()
+
+def async_engine(config):
+  url = make_url(config['SQLALCHEMY_DATABASE_URI']).set(drivername='postgresql+asyncpg')
+  timeout = str(config['DB_STATEMENT_TIMEOUT_MS'])
+  if config.get('DB_PGBOUNCER'):
+    # no prepared statement may outlive a transaction behind PgBouncer
+    url = url.update_query_dict({'prepared_statement_cache_size': '0'})
+    return create_async_engine(url, poolclass=NullPool, connect_args={'statement_cache_size': 0})
+  options = {key: value for key, value in config['SQLALCHEMY_ENGINE_OPTIONS'].items()
+             if key not in ('poolclass', 'connect_args')}
+  return create_async_engine(url, connect_args={'server_settings': {'statement_timeout': timeout}}, **options)
+
+engine = async_engine(flask_app.config)
+
+async def fetch_all(statement):
+  async with engine.connect() as connection:
+    return (await connection.execute(statement)).all()
+
+async def fetch_one(statement):
+  async with engine.connect() as connection:
+    return (await connection.execute(statement)).first()
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+# endpoint of the Flask view -> async view serving the same page
+views = {}
+
+def view(endpoint, cache_key=None):
+  def decorator(function):
+    views[endpoint] = (function, cache_key)
+    return function
+  return decorator
+
+async def facets(model, filters):
+  key = pages.facet_key(model, filters)
+  data = pages.facet_cache().get(key)
+  if data is None:
+    data = genre_facet_items(await fetch_all(genre_facets_statement(model, **filters)))
+    pages.facet_cache().set(key, data)
+  return data
+
+@view('pages.venues')
+async def venues():
+  area_index = pages.area_index()
+  filters = pages.request_filters()
+  indexed = flask_app.config.get('AREA_INDEX') and not any(filters.values())
+  # one look at the index: the listener thread may empty it at any time
+  data = area_index.warm_listing() if indexed else None
+  if data is None:
+    rows = await fetch_all(venue_area_statement(**filters))
+    data = area_index.listing(lambda: rows) if indexed else group_areas(rows)
+  return render_template('pages/venues.html', areas=data, facets=await facets(Venue, filters), filters=filters)
+
+@view('pages.artists')
+async def artists():
+  filters = pages.request_filters()
+  data, facet_data = await asyncio.gather(
+    fetch_all(db.select(*load_profile(Artist, 'card').columns)
+      .where(genre_filter(Artist, filters['genres'], filters['match_any']),
+             location_filter(Artist, filters['state'], filters['city']))
+      .order_by(Artist.id)),
+    facets(Artist, filters),
+  )
+  return render_template('pages/artists.html', artists=data, facets=facet_data, filters=filters)
+
+@view('pages.shows')
+async def shows():
+  start = pages.request_date('from')
+  end = pages.request_date('to')
+  if end:
+    end += timedelta(days=1)
+  if start is None and request.args.get('past') != '1':
+    start = datetime.now()
+  limit = flask_app.config['SHOWS_PAGE_SIZE']
+  rows = await fetch_all(keyset_statement(show_listing_statement(start, end), limit, pages.request_cursor()))
+  rows, cursor = keyset_result(rows, limit)
+  filters = {k: v for k, v in request.args.items() if k in ('from', 'to', 'past') and v}
+  return render_template('pages/shows.html', shows=[show_listing_item(row) for row in rows],
+    filters=filters, next_url=cursor and url_for('pages.shows', after=cursor, **filters))
+
+async def detail(model, venue_id=None, artist_id=None):
+  """Record, show lists and counts of a venue or artist page, queried concurrently."""
+  now = datetime.now()
+  limit = flask_app.config['SHOWS_PAGE_SIZE']
+  if model is Venue:
+    id, statement, items = venue_id, venue_shows_statement, venue_show_items
+  else:
+    id, statement, items = artist_id, artist_shows_statement, artist_show_items
+  record, upcoming, past, counts = await asyncio.gather(
+    fetch_one(db.select(*load_profile(model, 'detail').columns).where(model.id == id)),
+    fetch_all(statement(id, True, limit, now)),
+    fetch_all(statement(id, False, limit, now)),
+    fetch_one(show_counts_statement(model, id, now)),
+  )
+  if record is None:
+    abort(404)
+  data = record._asdict()
+  data['upcoming_shows'], data['upcoming_shows_cursor'] = items(upcoming, limit)
+  data['past_shows'], data['past_shows_cursor'] = items(past, limit)
+  data['past_shows_count'], data['upcoming_shows_count'] = counts or (0, 0)
+  return data
+
+@view('pages.show_venue', cache_key=venue_key)
+async def show_venue(venue_id):
+  return render_template('pages/show_venue.html', venue=await detail(Venue, venue_id=venue_id))
+
+@view('pages.show_artist', cache_key=artist_key)
+async def show_artist(artist_id):
+  return render_template('pages/show_artist.html', artist=await detail(Artist, artist_id=artist_id))
+
+async def more_shows(model, id, when, statement, items, endpoint, back_endpoint):
+  limit = flask_app.config['SHOWS_PAGE_SIZE']
+  record, rows = await asyncio.gather(
+    fetch_one(db.select(*load_profile(model, 'card').columns).where(model.id == id)),
+    fetch_all(statement(id, when == 'upcoming', limit, datetime.now(), pages.request_cursor())),
+  )
+  if record is None:
+    abort(404)
+  shows, cursor = items(rows, limit)
+  key = 'venue_id' if model is Venue else 'artist_id'
+  return render_template('pages/more_shows.html', shows=shows, when=when, name=record.name,
+    back_url=url_for(back_endpoint, **{key: id}),
+    next_url=cursor and url_for(endpoint, when=when, after=cursor, **{key: id}))
+
+@view('pages.more_venue_shows')
+async def more_venue_shows(venue_id, when):
+  return await more_shows(Venue, venue_id, when, venue_shows_statement, venue_show_items,
+    'pages.more_venue_shows', 'pages.show_venue')
+
+@view('pages.more_artist_shows')
+async def more_artist_shows(artist_id, when):
+  return await more_shows(Artist, artist_id, when, artist_shows_statement, artist_show_items,
+    'pages.more_artist_shows', 'pages.show_artist')
+
+#----------------------------------------------------------------------------#
+# Application.
+#----------------------------------------------------------------------------#
+
+class Application:
+  """Serves GETs of the endpoints in views itself and passes the rest to Flask."""
+
+  def __init__(self):
+    self.wsgi = WSGIMiddleware(flask_app)
+    self.urls = flask_app.url_map.bind('localhost')
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.lifespan(receive, send)
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+      try:
+        endpoint, values = self.urls.match(scope['path'], method='GET')
+      except HTTPException:
+        endpoint = None
+      if endpoint in views:
+        page = await self.render(scope, endpoint, values)
+        if page is not None:
+          return await self.respond(send, page)
+    await self.wsgi(scope, receive, send)
+
+  async def render(self, scope, endpoint, values):
+    """The page of an async view, or None to let the Flask app answer instead."""
+    function, cache_key = views[endpoint]
+    headers = [(key.decode('latin-1'), value.decode('latin-1')) for key, value in scope['headers']]
+    context = flask_app.test_request_context(
+      scope['path'], query_string=scope['query_string'], headers=headers)
+    with context:
+      page_cache = pages.page_cache()
+      # session-dependent pages (flashed messages) are left to Flask
+      if session.get('_flashes'):
+        return None
+      cached = cache_key is not None and page_cache.usable()
+      if cached:
+        page = page_cache.get(cache_key(**values))
+        if page is not None:
+          return page
+      try:
+        page = await function(**values)
+      except HTTPException:
+        return None
+      if cached:
+        page_cache.set(cache_key(**values), page)
+      return page
+
+  async def respond(self, send, page):
+    body = page.encode()
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+      (b'content-type', b'text/html; charset=utf-8'),
+      (b'content-length', str(len(body)).encode()),
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        # the Flask before_request hook that starts it never runs for the
+        # pages served here
+        with flask_app.app_context():
+          pages.start_listener()
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await engine.dispose()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+app = Application()
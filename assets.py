@@ -0,0 +1,155 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from flask import current_app, request, send_from_directory
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+# `flask assets` writes a copy of every file of static/ here, minified and
+# named after a hash of its content, with gzip and brotli variants next to it
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+# hashed names never change content, so browsers may keep them for a year
+# without asking again
+MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = ('.css', '.js', '.map', '.json', '.svg', '.eot', '.otf', '.ttf', '.txt', '.html')
+# variants by preference; the suffix is also the file extension
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def hashed_name(name, content):
+  root, ext = os.path.splitext(name)
+  return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+def minify(name, content):
+  """content minified if it is CSS or JS not minified already and the minifier is installed."""
+  if '.min.' in name:
+    return content
+  try:
+    if name.endswith('.css'):
+      import rcssmin
+      return rcssmin.cssmin(content.decode('utf-8')).encode('utf-8')
+    if name.endswith('.js'):
+      import rjsmin
+      return rjsmin.jsmin(content.decode('utf-8')).encode('utf-8')
+  except ImportError:
+    pass
+  return content
+
+def rewrite_urls(name, content, files):
+  """Point the url()s of a stylesheet at the hashed names of the files they load."""
+  def replace(match):
+    quote, url = match.groups()
+    if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+      return match.group(0)
+    path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+    target = posixpath.normpath(posixpath.join(posixpath.dirname(name), path))
+    if target not in files:
+      return match.group(0)
+    # the hashed files keep the directories of the originals
+    hashed = posixpath.relpath(files[target], posixpath.dirname(name))
+    return f'url({quote}{hashed}{suffix}{quote})'
+  return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+def compress(content):
+  """(encoding, compressed content) of the variants that come out smaller."""
+  variants = [('gzip', gzip.compress(content, 9, mtime=0))]
+  try:
+    import brotli
+    variants.append(('br', brotli.compress(content, quality=11)))
+  except ImportError:
+    pass
+  return [(encoding, data) for encoding, data in variants if len(data) < len(content) * 0.9]
+
+def build(static_folder):
+  """Build static_folder into its BUILD_DIR and return the manifest written there.
+
+  Stylesheets are built last, as their url()s name the hashed files. Files
+  of earlier builds are kept, so pages rendered before a deploy still load.
+  """
+  output = os.path.join(static_folder, BUILD_DIR)
+  names = []
+  for directory, subdirectories, filenames in os.walk(static_folder):
+    if directory == static_folder and BUILD_DIR in subdirectories:
+      subdirectories.remove(BUILD_DIR)
+    names.extend(os.path.relpath(os.path.join(directory, filename), static_folder).replace(os.sep, '/')
+                 for filename in filenames)
+  names.sort(key=lambda name: (name.endswith('.css'), name))
+
+  files, compressed = {}, {}
+  for name in names:
+    with open(os.path.join(static_folder, name), 'rb') as f:
+      content = minify(name, f.read())
+    if name.endswith('.css'):
+      content = rewrite_urls(name, content, files)
+    files[name] = hashed_name(name, content)
+    variants = compress(content) if name.endswith(COMPRESSIBLE) else []
+    compressed[files[name]] = [encoding for encoding, _ in variants]
+    path = os.path.join(output, files[name])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for suffix, data in [('', content)] + [(dict(ENCODINGS)[encoding], data) for encoding, data in variants]:
+      with open(path + suffix, 'wb') as f:
+        f.write(data)
+
+  manifest = {'files': files, 'compressed': compressed}
+  with open(os.path.join(output, MANIFEST), 'w') as f:
+    json.dump(manifest, f, indent=1, sort_keys=True)
+  return manifest
+
+
+class StaticAssets:
+  """Serves static/ from the build of `flask assets`, when there is one.
+
+  url_for('static', filename=...) then gives the hashed name of the file,
+  which is served with far-future immutable caching and, if the client
+  accepts it, precompressed with brotli or gzip. Files missing from the
+  build are served from static/ as before. STATIC_BUILD=0 turns this off,
+  for editing the files without rebuilding.
+  """
+
+  def __init__(self, app=None):
+    self.files = {}
+    self.compressed = {}
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    path = os.path.join(app.static_folder, BUILD_DIR, MANIFEST)
+    if not app.config.get('STATIC_BUILD', True) or not os.path.exists(path):
+      return
+    with open(path) as f:
+      manifest = json.load(f)
+    self.files = {name: f'{BUILD_DIR}/{hashed}' for name, hashed in manifest['files'].items()}
+    self.compressed = {f'{BUILD_DIR}/{hashed}': encodings for hashed, encodings in manifest['compressed'].items()}
+    app.url_defaults(self.hash_filename)
+    app.view_functions['static'] = self.send
+    app.extensions['static_assets'] = self
+
+  def url(self, filename):
+    """The path under static/ that url_for('static', filename=filename) links to."""
+    return self.files.get(filename, filename)
+
+  def hash_filename(self, endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+      values['filename'] = self.url(values['filename'])
+
+  def send(self, filename):
+    if filename not in self.compressed:
+      return current_app.send_static_file(filename)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = next((encoding for encoding, _ in ENCODINGS
+                     if encoding in self.compressed[filename] and request.accept_encodings[encoding]), None)
+    suffix = dict(ENCODINGS)[encoding] if encoding else ''
+    response = send_from_directory(current_app.static_folder, filename + suffix, mimetype=mimetype,
+                                   max_age=MAX_AGE)
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+      response.content_encoding = encoding
+    return response
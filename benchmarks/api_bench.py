@@ -0,0 +1,98 @@
+"""Throughput of the JSON API against the HTML pages showing the same data.
+
+Runs every pair of routes through the test client against the configured
+database and prints one JSON line per route with its requests/sec. The
+"api (304)" rows replay the ETag of the first response.
+
+With --offline no database is needed: it times serializing a page of
+synthetic venues with the stdlib json and with orjson (when installed),
+and answering a replayed ETag through conditional() with the remembered
+ETag shortcut (INVALIDATION_BUS on) and without it.
+
+    python benchmarks/api_bench.py [--requests 500] [--offline]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import Venue, Artist, db
+import api
+
+
+def throughput(client, url, count, headers=None):
+  started = time.perf_counter()
+  for _ in range(count):
+    client.get(url, headers=headers)
+  return count / (time.perf_counter() - started)
+
+
+def rate(function, count):
+  started = time.perf_counter()
+  for _ in range(count):
+    function()
+  return count / (time.perf_counter() - started)
+
+
+def offline(count):
+  page = {'data': [dict(zip(api.VENUE_FIELDS, (id, f'Venue {id}', 'San Francisco', 'CA', f'{id} Main Street',
+    '555-123-4567', ['Jazz', 'Blues'], f'https://picsum.photos/seed/venue{id}/300',
+    f'https://www.facebook.com/venue{id}', f'https://venue{id}.example.com', True, '')))
+    for id in range(1, 51)], 'next': '/api/v1/venues?after=50&limit=50'}
+  serializers = {'json': lambda: json.dumps(page, separators=(',', ':'), default=str).encode()}
+  try:
+    import orjson
+    serializers['orjson'] = lambda: orjson.dumps(page)
+  except ImportError:
+    pass
+  for name, dumps in serializers.items():
+    print(json.dumps({'kind': f'serialize ({name})', 'per_sec': round(rate(dumps, count * 10), 1)}))
+
+  etag = api.sha1(api.dumps(page)).hexdigest()
+  for bus in (False, True):
+    app.config['INVALIDATION_BUS'] = bus
+    with app.test_request_context('/api/v1/venues', headers={'If-None-Match': f'"{etag}"'}):
+      api.list_etags().clear()
+      answer = lambda: api.conditional(api.list_etags(), 'bench', lambda: page)
+      assert answer().status_code == 304
+      print(json.dumps({'kind': '304 ' + ('remembered ETag' if bus else 'rebuilt body'),
+                        'per_sec': round(rate(answer, count * 10), 1)}))
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--requests', type=int, default=500)
+  parser.add_argument('--offline', action='store_true')
+  args = parser.parse_args()
+  if args.offline:
+    return offline(args.requests)
+
+  with app.app_context():
+    venue_id = db.session.query(Venue.id).order_by(Venue.id).limit(1).scalar()
+    artist_id = db.session.query(Artist.id).order_by(Artist.id).limit(1).scalar()
+
+  pairs = [('/venues', '/api/v1/venues'), ('/artists', '/api/v1/artists'), ('/shows', '/api/v1/shows')]
+  if venue_id is not None:
+    pairs.append((f'/venues/{venue_id}', f'/api/v1/venues/{venue_id}'))
+  if artist_id is not None:
+    pairs.append((f'/artists/{artist_id}', f'/api/v1/artists/{artist_id}'))
+
+  client = app.test_client()
+  for html, api in pairs:
+    etag = client.get(api).headers.get('ETag')
+    results = {
+      'html': throughput(client, html, args.requests),
+      'api': throughput(client, api, args.requests),
+      'api (304)': throughput(client, api, args.requests, {'If-None-Match': etag}),
+    }
+    for kind, rate in results.items():
+      print(json.dumps({'route': html if kind == 'html' else api, 'kind': kind,
+                        'requests_per_sec': round(rate, 1)}))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,135 @@
+"""Requests/sec and memory per connection of the ASGI entry point against WSGI.
+
+Starts each server on the configured database -- uvicorn with asgi:app and
+the Flask app under gunicorn (gthread) -- then holds --concurrency keep-alive
+connections open against it, each requesting the routes in turn. Prints one
+JSON line per server with its requests/sec and the resident memory of its
+processes divided by the number of connections.
+
+    python benchmarks/asgi_bench.py [--concurrency 100] [--seconds 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import app
+from models import Venue, Artist, db
+
+SERVERS = {
+  'asgi': ['uvicorn', 'asgi:app', '--port', '{port}', '--workers', '{workers}', '--no-access-log'],
+  'wsgi': ['gunicorn', 'app:app', '--bind', '127.0.0.1:{port}', '--workers', '{workers}',
+           '--worker-class', 'gthread', '--threads', '{threads}'],
+}
+
+
+def rss_bytes(pid):
+  """Resident memory of a process and its children, from /proc."""
+  total = 0
+  pids = [pid]
+  while pids:
+    current = pids.pop()
+    try:
+      with open(f'/proc/{current}/status') as status:
+        total += next(int(line.split()[1]) * 1024 for line in status if line.startswith('VmRSS:'))
+      with open(f'/proc/{current}/task/{current}/children') as children:
+        pids.extend(int(child) for child in children.read().split())
+    except (FileNotFoundError, StopIteration):
+      pass
+  return total
+
+
+async def wait_for(port, timeout=30):
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    try:
+      _, writer = await asyncio.open_connection('127.0.0.1', port)
+      writer.close()
+      return
+    except OSError:
+      await asyncio.sleep(0.2)
+  raise RuntimeError(f'server on port {port} did not start')
+
+
+async def client(port, paths, deadline, counts):
+  reader, writer = await asyncio.open_connection('127.0.0.1', port)
+  try:
+    while time.monotonic() < deadline:
+      for path in paths:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+        length = 0
+        while True:
+          line = await reader.readline()
+          if line in (b'\r\n', b''):
+            break
+          name, _, value = line.decode('latin-1').partition(':')
+          if name.lower() == 'content-length':
+            length = int(value)
+        await reader.readexactly(length)
+        counts[0] += 1
+  finally:
+    writer.close()
+
+
+async def measure(port, paths, concurrency, seconds, pid):
+  counts = [0]
+  deadline = time.monotonic() + seconds
+  started = time.monotonic()
+  tasks = [asyncio.create_task(client(port, paths, deadline, counts)) for _ in range(concurrency)]
+  await asyncio.sleep(seconds / 2)
+  memory = rss_bytes(pid)
+  await asyncio.gather(*tasks)
+  return counts[0] / (time.monotonic() - started), memory
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--concurrency', type=int, default=100)
+  parser.add_argument('--seconds', type=float, default=20)
+  parser.add_argument('--workers', type=int, default=1)
+  parser.add_argument('--threads', type=int, default=8)
+  parser.add_argument('--port', type=int, default=8765)
+  args = parser.parse_args()
+
+  with app.app_context():
+    venue_id = db.session.query(Venue.id).order_by(Venue.id).limit(1).scalar()
+    artist_id = db.session.query(Artist.id).order_by(Artist.id).limit(1).scalar()
+  paths = ['/venues', '/artists', '/shows']
+  if venue_id is not None:
+    paths.append(f'/venues/{venue_id}')
+  if artist_id is not None:
+    paths.append(f'/artists/{artist_id}')
+
+  # measure the database round trips, not the page cache
+  environ = dict(os.environ, PAGE_CACHE='none')
+  for name, command in SERVERS.items():
+    command = [part.format(port=args.port, workers=args.workers, threads=args.threads)
+               for part in command]
+    server = subprocess.Popen(command, cwd=ROOT, env=environ,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+      asyncio.run(wait_for(args.port))
+      idle = rss_bytes(server.pid)
+      rate, loaded = asyncio.run(measure(args.port, paths, args.concurrency, args.seconds, server.pid))
+    finally:
+      server.send_signal(signal.SIGTERM)
+      server.wait()
+    print(json.dumps({
+      'server': name,
+      'concurrency': args.concurrency,
+      'requests_per_sec': round(rate, 1),
+      'rss_mb': round(loaded / 2**20, 1),
+      'kb_per_connection': round((loaded - idle) / 1024 / args.concurrency, 1),
+    }))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+"""Concurrent show bookings against the no-overlap constraints.
+
+Creates a few venues and artists, then has --threads connections book random
+two-hour slots among them as fast as they can, each booking its own
+transaction. Prints the bookings/sec committed and rejected as overlapping,
+checks that no venue or artist ended up double-booked, and deletes what it
+created.
+
+    python benchmarks/booking_bench.py [--threads 16] [--seconds 10] [--owners 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import IntegrityError
+from app import app
+from models import Venue, Artist, Show, db
+from queries import slot_overlaps
+
+SLOTS = 24 * 14  # hourly start times over two weeks
+
+
+def create_owners(count):
+  venues = [Venue(name=f'Bench venue {i}', city='Bench City', state='CA', address='Address',
+                  phone='123-123-1234', facebook_link='', image_link='', genres=['Jazz'],
+                  website_link='') for i in range(count)]
+  artists = [Artist(name=f'Bench artist {i}', city='Bench City', state='CA', phone='123-123-1234',
+                    genres=['Jazz'], facebook_link='', seeking_venue='False') for i in range(count)]
+  db.session.add_all(venues + artists)
+  db.session.commit()
+  return [venue.id for venue in venues], [artist.id for artist in artists]
+
+
+def book(engine, venue_ids, artist_ids, start, deadline, counts, lock):
+  booked = rejected = 0
+  table = Show.__table__
+  with engine.connect() as connection:
+    while time.monotonic() < deadline:
+      slot = start + timedelta(hours=random.randrange(SLOTS))
+      try:
+        with connection.begin():
+          connection.execute(table.insert().values(
+            venue_id=random.choice(venue_ids), artist_id=random.choice(artist_ids),
+            start_time=slot, end_time=slot + timedelta(hours=2)))
+        booked += 1
+      except IntegrityError:
+        rejected += 1
+  with lock:
+    counts['booked'] += booked
+    counts['rejected'] += rejected
+
+
+def double_bookings(column, ids):
+  other = db.aliased(Show)
+  return db.session.query(Show.id).join(other, db.and_(
+    getattr(other, column.key) == column, other.id != Show.id,
+    slot_overlaps(other.start_time, other.end_time))).filter(column.in_(ids)).count()
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--threads', type=int, default=16)
+  parser.add_argument('--seconds', type=float, default=10)
+  parser.add_argument('--owners', type=int, default=20)
+  args = parser.parse_args()
+
+  with app.app_context():
+    venue_ids, artist_ids = create_owners(args.owners)
+    try:
+      start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=365)
+      counts = {'booked': 0, 'rejected': 0}
+      lock = threading.Lock()
+      deadline = time.monotonic() + args.seconds
+      threads = [threading.Thread(target=book, args=(db.engine, venue_ids, artist_ids, start, deadline, counts, lock))
+                 for _ in range(args.threads)]
+      started = time.monotonic()
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+      elapsed = time.monotonic() - started
+      print(json.dumps({
+        'threads': args.threads,
+        'booked_per_sec': round(counts['booked'] / elapsed, 1),
+        'rejected_per_sec': round(counts['rejected'] / elapsed, 1),
+        'venue_double_bookings': double_bookings(Show.venue_id, venue_ids),
+        'artist_double_bookings': double_bookings(Show.artist_id, artist_ids),
+      }))
+    finally:
+      db.session.rollback()
+      db.session.query(Show).filter(Show.venue_id.in_(venue_ids)).delete(synchronize_session=False)
+      db.session.query(Show).filter(Show.artist_id.in_(artist_ids)).delete(synchronize_session=False)
+      db.session.query(Venue).filter(Venue.id.in_(venue_ids)).delete(synchronize_session=False)
+      db.session.query(Artist).filter(Artist.id.in_(artist_ids)).delete(synchronize_session=False)
+      db.session.commit()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,85 @@
+"""Genre filter and facet latency at growing table sizes.
+
+Fills the artist table with synthetic rows inside a transaction that is
+rolled back at the end -- Classical is given to one artist in a thousand,
+the other genres are spread evenly -- and times, at each size, the first
+page of artists matching each filter and the facet counts under it. Prints
+one JSON line per (rows, filter, query).
+
+    python benchmarks/genre_bench.py [--sizes 10000,100000,1000000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from enums import Genre
+from models import Artist, db
+from queries import genre_filter, genre_facets
+
+FILTERS = [(['Jazz'], False), (['Jazz', 'Blues'], False), (['Jazz', 'Blues'], True), (['Classical'], False)]
+
+# the locations of the rows FILL adds
+LOCATIONS = """
+INSERT INTO location (state, city, city_key)
+SELECT 'CA', 'City ' || i, 'city ' || i FROM generate_series(0, 499) AS i
+ON CONFLICT (state, city_key) DO NOTHING
+"""
+
+FILL = """
+INSERT INTO artist (name, city, state, location_id, phone, genres, facebook_link, seeking_venue)
+SELECT 'Artist ' || md5(i::text), 'City ' || (i % 500), 'CA',
+       (SELECT id FROM location WHERE state = 'CA' AND city_key = 'city ' || (i % 500)), '123-123-1234',
+       CASE WHEN i % 1000 = 0 THEN ARRAY['Classical']
+            ELSE ARRAY[(:genres)[1 + i % 18], (:genres)[1 + (i / 18) % 18]] END,
+       'https://facebook.com', 'false'
+FROM generate_series(1, :count) AS i
+"""
+
+
+def timed(function, repeat):
+  timings = []
+  for _ in range(repeat):
+    started = time.perf_counter()
+    function()
+    timings.append((time.perf_counter() - started) * 1000)
+  return {'p50_ms': round(statistics.median(timings), 3), 'max_ms': round(max(timings), 3)}
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--sizes', default='10000,100000,1000000')
+  parser.add_argument('--repeat', type=int, default=20)
+  parser.add_argument('--page', type=int, default=50)
+  args = parser.parse_args()
+  genres = [genre.name for genre in Genre if genre.name != 'Classical']
+
+  with app.app_context():
+    filled = 0
+    try:
+      db.session.execute(db.text(LOCATIONS))
+      for size in [int(size) for size in args.sizes.split(',')]:
+        db.session.execute(db.text(FILL), {'count': size - filled, 'genres': genres})
+        db.session.execute(db.text('ANALYZE artist'))
+        filled = size
+        for selected, match_any in FILTERS:
+          page = db.session.query(Artist.id).filter(genre_filter(Artist, selected, match_any))\
+            .order_by(Artist.id).limit(args.page)
+          results = {
+            'page': timed(page.all, args.repeat),
+            'facets': timed(lambda: genre_facets(Artist, selected, match_any), args.repeat),
+          }
+          for query, timing in results.items():
+            print(json.dumps({'rows': size, 'genres': selected, 'match': 'any' if match_any else 'all',
+                              'query': query, **timing}))
+    finally:
+      db.session.rollback()
+
+
+if __name__ == '__main__':
+  main()
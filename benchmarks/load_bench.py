@@ -0,0 +1,307 @@
+"""Latency, throughput and query counts of every route under concurrent load.
+
+Starts the Flask app under gunicorn (gthread) on the configured database,
+with PROFILE_REQUESTS on so every response reports its query count in its
+Server-Timing header, and has --concurrency keep-alive clients request the
+routes in turn for --seconds. Fill the database first, e.g. with
+'flask seed --scale 100k'. Prints one JSON line per route, and one for all
+of them, with requests/sec, p50/p95/p99 latency, errors and queries per
+request; --output also writes them to a file, and --baseline compares them
+to such a file from an earlier run.
+
+With --writes the mix includes the create and edit forms, on venues and
+artists the benchmark creates and deletes at the end. With --smoke each
+route is requested once, in process, with query budgets enforced, and the
+exit status tells whether all of them succeeded.
+
+    python benchmarks/load_bench.py [--concurrency 32] [--seconds 30] [--writes]
+    python benchmarks/load_bench.py --smoke
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# read by config.py on import, for the in-process --smoke run
+os.environ.setdefault('PROFILE_REQUESTS', '1')
+os.environ.setdefault('QUERY_BUDGETS', 'raise')
+
+from app import app
+from models import Venue, Artist, Show, db
+import stats
+
+SERVER = ['gunicorn', 'app:app', '--bind', '127.0.0.1:{port}', '--workers', '{workers}',
+          '--worker-class', 'gthread', '--threads', '{threads}']
+
+VENUE_FORM = {'city': 'Springfield', 'state': 'IL', 'address': '1 Load Street', 'phone': '555-555-5555',
+              'image_link': 'https://example.com/load.png', 'genres': 'Jazz',
+              'facebook_link': 'https://www.facebook.com/load', 'website_link': 'https://example.com',
+              'seeking_talent': 'y', 'seeking_description': ''}
+ARTIST_FORM = {'city': 'Springfield', 'state': 'IL', 'phone': '555-555-5555',
+               'image_link': 'https://example.com/load.png', 'genres': 'Jazz',
+               'facebook_link': 'https://www.facebook.com/load', 'website_link': 'https://example.com',
+               'seeking_venue': 'y', 'seeking_description': ''}
+
+
+def sample_ids(model, count):
+  return [id for id, in db.session.query(model.id).order_by(db.func.random()).limit(count)]
+
+
+def read_routes(venue_ids, artist_ids):
+  """(name, method, path, form) of every page route, on sampled records."""
+  venue_id = venue_ids[0] if venue_ids else 0
+  artist_id = artist_ids[0] if artist_ids else 0
+  return [
+    ('index', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('venues_filtered', 'GET', '/venues?genre=Jazz&state=CA', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'venue 1'}),
+    ('show_venue', 'GET', f'/venues/{venue_id}', None),
+    ('more_venue_shows', 'GET', f'/venues/{venue_id}/shows/past', None),
+    ('create_venue_form', 'GET', '/venues/create', None),
+    ('edit_venue', 'GET', f'/venues/{venue_id}/edit', None),
+    ('artists', 'GET', '/artists', None),
+    ('artists_filtered', 'GET', '/artists?genre=Pop&genre=Rock_n_Roll&match=any', None),
+    ('search_artists', 'POST', '/artists/search', {'search_term': 'artist 2'}),
+    ('show_artist', 'GET', f'/artists/{artist_id}', None),
+    ('more_artist_shows', 'GET', f'/artists/{artist_id}/shows/upcoming', None),
+    ('create_artist_form', 'GET', '/artists/create', None),
+    ('edit_artist', 'GET', f'/artists/{artist_id}/edit', None),
+    ('shows', 'GET', '/shows', None),
+    ('shows_past', 'GET', '/shows?past=1', None),
+    ('create_shows', 'GET', '/shows/create', None),
+    ('cache_stats', 'GET', '/cache/stats', None),
+    ('pool_stats', 'GET', '/pool/stats', None),
+  ]
+
+
+def create_owners(count):
+  owner = {'city': 'Springfield', 'state': 'IL', 'phone': '555-555-5555', 'genres': ['Jazz'],
+           'image_link': 'https://example.com/load.png', 'facebook_link': 'https://www.facebook.com/load',
+           'website_link': 'https://example.com'}
+  venues = [Venue(name=f'Load venue {i}', address='1 Load Street', seeking_talent=True, **owner)
+            for i in range(count)]
+  artists = [Artist(name=f'Load artist {i}', seeking_venue='True', **owner) for i in range(count)]
+  db.session.add_all(venues + artists)
+  db.session.commit()
+  return [venue.id for venue in venues], [artist.id for artist in artists]
+
+
+def write_routes(venue_ids, artist_ids, rng):
+  """Routes that write, as functions making (name, method, path, form) on each call."""
+  start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=400)
+  return [
+    lambda: ('create_venue_submission', 'POST', '/venues/create',
+             {'name': f'Load venue {rng.randrange(10**9)}', **VENUE_FORM}),
+    lambda: ('create_artist_submission', 'POST', '/artists/create',
+             {'name': f'Load artist {rng.randrange(10**9)}', **ARTIST_FORM}),
+    lambda: ('create_show_submission', 'POST', '/shows/create', {
+      'venue_id': rng.choice(venue_ids), 'artist_id': rng.choice(artist_ids), 'duration': 120,
+      'start_time': (start + timedelta(hours=rng.randrange(24 * 365))).strftime('%Y-%m-%d %H:%M:%S')}),
+    lambda: ('edit_venue_submission', 'POST', f'/venues/{rng.choice(venue_ids)}/edit',
+             {'name': 'Load venue edited', **VENUE_FORM}),
+    lambda: ('edit_artist_submission', 'POST', f'/artists/{rng.choice(artist_ids)}/edit',
+             {'name': 'Load artist edited', **ARTIST_FORM}),
+  ]
+
+
+def delete_owners():
+  # the ones create_owners() made and the ones the create forms did
+  venues = db.session.query(Venue.id).filter(Venue.name.like('Load venue%'))
+  artists = db.session.query(Artist.id).filter(Artist.name.like('Load artist%'))
+  db.session.query(Show).filter(Show.venue_id.in_(venues.subquery()) | Show.artist_id.in_(artists.subquery()))\
+    .delete(synchronize_session=False)
+  db.session.query(Venue).filter(Venue.id.in_(venues.subquery())).delete(synchronize_session=False)
+  db.session.query(Artist).filter(Artist.id.in_(artists.subquery())).delete(synchronize_session=False)
+  stats.rebuild(db.session.connection())
+  db.session.commit()
+
+
+def queries_of(server_timing):
+  # db;dur=1.2;desc="5 queries", render;dur=...
+  for metric in (server_timing or '').split(','):
+    if metric.strip().startswith('db;'):
+      desc = metric.partition('desc="')[2]
+      return int(desc.split()[0]) if desc else None
+  return None
+
+
+def percentile(values, share):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def summary(name, results, elapsed):
+  latencies = [latency for latency, _, _ in results]
+  queries = [count for _, _, count in results if count is not None]
+  return {
+    'route': name,
+    'requests': len(results),
+    'requests_per_sec': round(len(results) / elapsed, 1),
+    'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+    'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+    'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    'errors': sum(1 for _, status, _ in results if status >= 500),
+    'queries_avg': round(sum(queries) / len(queries), 2) if queries else None,
+    'queries_max': max(queries) if queries else None,
+  }
+
+
+def request(connection, method, path, form):
+  body = urlencode(form) if form else None
+  headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+  started = time.perf_counter()
+  connection.request(method, path, body=body, headers=headers)
+  response = connection.getresponse()
+  response.read()
+  return time.perf_counter() - started, response.status, queries_of(response.getheader('Server-Timing'))
+
+
+def client(port, routes, writes, deadline, results, lock, seed):
+  rng = random.Random(seed)
+  connection = http.client.HTTPConnection('127.0.0.1', port)
+  local = defaultdict(list)
+  index = seed
+  try:
+    while time.monotonic() < deadline:
+      index += 1
+      if writes and index % 5 == 0:
+        route = rng.choice(writes)()
+      else:
+        route = routes[index % len(routes)]
+      name, method, path, form = route
+      try:
+        local[name].append(request(connection, method, path, form))
+      except (http.client.HTTPException, OSError):
+        local[name].append((0.0, 599, None))
+        connection.close()
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+  finally:
+    connection.close()
+    with lock:
+      for name, values in local.items():
+        results[name].extend(values)
+
+
+def wait_for(port, timeout=30):
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    try:
+      connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+      connection.request('GET', '/')
+      connection.getresponse().read()
+      return
+    except OSError:
+      time.sleep(0.2)
+  raise RuntimeError(f'server on port {port} did not start')
+
+
+def smoke(routes, writes, delete_id):
+  """Each route once in process; returns the number of failures."""
+  app.testing = True
+  client = app.test_client()
+  failures = 0
+  for name, method, path, form in routes + [write() for write in writes] + \
+      [('delete_venue', 'DELETE', f'/venues/{delete_id}', None)]:
+    try:
+      response = client.open(path, method=method, data=form)
+      status, queries = response.status_code, queries_of(response.headers.get('Server-Timing'))
+      response.close()
+    except Exception as e:
+      status, queries = 500, None
+      print(f'{name}: {e}', file=sys.stderr)
+    failures += status >= 500
+    print(json.dumps({'route': name, 'status': status, 'queries': queries}))
+  return failures
+
+
+def compare(rows, baseline_file):
+  with open(baseline_file) as f:
+    baseline = {row['route']: row for row in map(json.loads, f)}
+  for row in rows:
+    before = baseline.get(row['route'])
+    if before:
+      for key in ('requests_per_sec', 'p95_ms', 'queries_avg'):
+        if before.get(key) and row.get(key) is not None:
+          row[f'{key}_change'] = round(row[key] / before[key] - 1, 3)
+  return rows
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--concurrency', type=int, default=32)
+  parser.add_argument('--seconds', type=float, default=30)
+  parser.add_argument('--workers', type=int, default=2)
+  parser.add_argument('--threads', type=int, default=8)
+  parser.add_argument('--port', type=int, default=8766)
+  parser.add_argument('--writes', action='store_true', help='Mix in the create and edit forms.')
+  parser.add_argument('--smoke', action='store_true', help='Request each route once, in process.')
+  parser.add_argument('--output', help='Also write the JSON lines to this file.')
+  parser.add_argument('--baseline', help='JSON lines of an earlier run to compare with.')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  rng = random.Random(args.seed)
+  with app.app_context():
+    routes = read_routes(sample_ids(Venue, 1), sample_ids(Artist, 1))
+    venue_ids, artist_ids = create_owners(10 if args.writes or args.smoke else 0)
+  writes = write_routes(venue_ids, artist_ids, rng) if args.writes or args.smoke else []
+
+  try:
+    if args.smoke:
+      sys.exit(1 if smoke(routes, writes, venue_ids[-1]) else 0)
+
+    # measure the database round trips, not the page cache; report budget
+    # breaches without failing the requests
+    environ = dict(os.environ, PAGE_CACHE='none', PROFILE_REQUESTS='1', QUERY_BUDGETS='warn')
+    command = [part.format(port=args.port, workers=args.workers, threads=args.threads) for part in SERVER]
+    server = subprocess.Popen(command, cwd=ROOT, env=environ,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+      wait_for(args.port)
+      results = defaultdict(list)
+      lock = threading.Lock()
+      deadline = time.monotonic() + args.seconds
+      threads = [threading.Thread(target=client, args=(args.port, routes, writes, deadline, results, lock, i))
+                 for i in range(args.concurrency)]
+      started = time.monotonic()
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+      elapsed = time.monotonic() - started
+    finally:
+      server.send_signal(signal.SIGTERM)
+      server.wait()
+
+    rows = [summary(name, values, elapsed) for name, values in sorted(results.items())]
+    rows.append(summary('all', [value for values in results.values() for value in values], elapsed))
+    for row in rows:
+      row['concurrency'] = args.concurrency
+    if args.baseline:
+      rows = compare(rows, args.baseline)
+    lines = [json.dumps(row) for row in rows]
+    print('\n'.join(lines))
+    if args.output:
+      with open(args.output, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+  finally:
+    if venue_ids:
+      with app.app_context():
+        delete_owners()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,73 @@
+"""Search latency at growing table sizes.
+
+Fills the venue table with synthetic rows inside a transaction that is rolled
+back at the end, times the search query at each size and prints one JSON line
+per (rows, term). With the trigram index in place the median latency should
+grow far slower than the row count.
+
+    python benchmarks/search_bench.py [--sizes 1000,10000,100000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import Venue, db
+from queries import search
+
+TERMS = ['hop', 'music', 'san francisco', 'zzzz']
+
+# the locations of the rows FILL adds
+LOCATIONS = """
+INSERT INTO location (state, city, city_key)
+SELECT 'CA', 'City ' || i, 'city ' || i FROM generate_series(0, 499) AS i
+ON CONFLICT (state, city_key) DO NOTHING
+"""
+
+FILL = """
+INSERT INTO venue (name, city, state, location_id, address, phone, facebook_link, image_link,
+                   genres, website_link, seeking_talent)
+SELECT 'Venue ' || md5(i::text), 'City ' || (i % 500), 'CA',
+       (SELECT id FROM location WHERE state = 'CA' AND city_key = 'city ' || (i % 500)), 'Address', '123-123-1234',
+       'https://facebook.com', 'https://example.com', ARRAY['Jazz'], 'https://example.com', false
+FROM generate_series(1, :count) AS i
+"""
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--sizes', default='1000,10000,100000')
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  with app.app_context():
+    filled = 0
+    try:
+      db.session.execute(db.text(LOCATIONS))
+      for size in [int(size) for size in args.sizes.split(',')]:
+        db.session.execute(db.text(FILL), {'count': size - filled})
+        db.session.execute(db.text('ANALYZE venue'))
+        filled = size
+        for term in TERMS:
+          timings = []
+          for _ in range(args.repeat):
+            started = time.perf_counter()
+            search(Venue, term, app.config['SEARCH_LIMIT'])
+            timings.append((time.perf_counter() - started) * 1000)
+          print(json.dumps({
+            'rows': size,
+            'term': term,
+            'p50_ms': round(statistics.median(timings), 3),
+            'max_ms': round(max(timings), 3),
+          }))
+    finally:
+      db.session.rollback()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,55 @@
+"""Cold start of a worker: import, create_app() and the first request.
+
+Runs each of --runs fresh interpreters that import app, build the app and
+serve GET / through the test client (a page that runs no query, so no
+database is needed), timing each step. Prints one JSON line with the median
+of each and exits with status 1 if import plus first request takes longer
+than --budget-ms.
+
+    python benchmarks/startup_bench.py [--runs 10] [--budget-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUN = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+response = flask_app.test_client().get('/')
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_ms': (created - imported) * 1000,
+                  'first_request_ms': (served - created) * 1000}))
+"""
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('--budget-ms', type=float, default=1500)
+  args = parser.parse_args()
+
+  runs = []
+  for _ in range(args.runs):
+    output = subprocess.run([sys.executable, '-c', RUN], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    runs.append(json.loads(output.splitlines()[-1]))
+  result = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+  result['total_ms'] = round(statistics.median(sum(run.values()) for run in runs), 1)
+  result['budget_ms'] = args.budget_ms
+  print(json.dumps(result))
+  if result['total_ms'] > args.budget_ms:
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
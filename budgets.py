@@ -0,0 +1,152 @@
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+#----------------------------------------------------------------------------#
+# Query budgets.
+#----------------------------------------------------------------------------#
+
+class QueryBudgetExceeded(Exception):
+  pass
+
+# counters active on this thread, innermost last
+_active = threading.local()
+
+def _counters():
+  if not hasattr(_active, 'counters'):
+    _active.counters = []
+  return _active.counters
+
+def count_statement(connection, cursor, statement, parameters, context, executemany):
+  # session setup such as pool.init_engine()'s SET LOCAL is not a query
+  if context is not None and context.execution_options.get('uncounted'):
+    return
+  for counter in _counters():
+    counter.statements.append(statement)
+
+def listen_engines():
+  # on the Engine class, so replica engines count as well
+  if not event.contains(Engine, 'before_cursor_execute', count_statement):
+    event.listen(Engine, 'before_cursor_execute', count_statement)
+
+# expanded IN lists, so a lookup of 3 ids and one of 4 have the same shape
+IN_LIST = re.compile(r'\((?:%\(\w+\)s, )*%\(\w+\)s\)')
+
+def shape(statement):
+  """The statement with its whitespace and IN lists normalized."""
+  return IN_LIST.sub('(...)', ' '.join(statement.split()))
+
+
+class QueryCounter:
+  """Collects the statements run on this thread while it is entered."""
+
+  def __init__(self):
+    self.statements = []
+
+  def __enter__(self):
+    listen_engines()
+    _counters().append(self)
+    return self
+
+  def __exit__(self, *exc_info):
+    _counters().remove(self)
+
+  def __len__(self):
+    return len(self.statements)
+
+  def problems(self, max_queries=None, max_repeats=None):
+    """What the statements counted break of the budget, as messages."""
+    problems = []
+    if max_queries is not None and len(self.statements) > max_queries:
+      problems.append(f'{len(self.statements)} queries, budget is {max_queries}')
+    if max_repeats is not None:
+      for statement, times in Counter(map(shape, self.statements)).most_common():
+        if times <= max_repeats:
+          break
+        problems.append(f'ran {times} times, at most {max_repeats} allowed: {statement[:200]}')
+    return problems
+
+
+@contextmanager
+def query_budget(max_queries=None, max_repeats=None):
+  """Raise QueryBudgetExceeded if the block runs more statements than allowed.
+
+      with query_budget(2, max_repeats=1):
+        ...
+  """
+  with QueryCounter() as counter:
+    yield counter
+  problems = counter.problems(max_queries, max_repeats)
+  if problems:
+    raise QueryBudgetExceeded('; '.join(problems))
+
+def budget(max_queries, max_repeats=None):
+  """Declare how many statements a view may run; see QueryBudgets."""
+  def decorator(view):
+    view.query_budget = (max_queries, max_repeats)
+    return view
+  return decorator
+
+
+class QueryBudgets:
+  """Checks every request against the budget its view declares with @budget.
+
+  A request that runs more statements than its view's budget, or the same
+  statement shape more than max_repeats (QUERY_REPEAT_LIMIT by default)
+  times -- the mark of an N+1 -- is reported according to QUERY_BUDGETS:
+  'raise' fails the request with QueryBudgetExceeded, 'warn' logs it and
+  anything else turns checking off. Streamed responses run their queries
+  after the response has started, and writes have committed by the time
+  the check runs, so both are only ever logged.
+  """
+
+  def __init__(self, app):
+    self.mode = app.config.get('QUERY_BUDGETS', 'off')
+    self.max_repeats = app.config.get('QUERY_REPEAT_LIMIT', 3)
+    if self.mode not in ('raise', 'warn'):
+      return
+    self.app = app
+    app.before_request(self.start)
+    app.after_request(self.check)
+    app.teardown_request(self.stop)
+
+  def limits(self):
+    view = self.app.view_functions.get(request.endpoint)
+    max_queries, max_repeats = getattr(view, 'query_budget', (None, None))
+    return max_queries, max_repeats if max_repeats is not None else self.max_repeats
+
+  def start(self):
+    g.query_counter = QueryCounter().__enter__()
+
+  def check(self, response):
+    counter = g.get('query_counter')
+    if counter is None:
+      return response
+    limits = self.limits()
+    label = f'{request.method} {request.path} ({request.endpoint})'
+    if response.is_streamed:
+      response.call_on_close(lambda: self.report(label, counter.problems(*limits), self.app.logger.warning))
+      return response
+    if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+      # a 500 would report a committed write as failed
+      self.report(label, counter.problems(*limits), self.app.logger.warning)
+      return response
+    self.report(label, counter.problems(*limits), self.raise_or_warn)
+    return response
+
+  def stop(self, exc):
+    counter = g.pop('query_counter', None)
+    if counter is not None and counter in _counters():
+      counter.__exit__(None, None, None)
+
+  def raise_or_warn(self, message):
+    if self.mode == 'raise':
+      raise QueryBudgetExceeded(message)
+    self.app.logger.warning(message)
+
+  def report(self, label, problems, emit):
+    if problems:
+      emit(f'{label}: ' + '; '.join(problems))
@@ -0,0 +1,62 @@
+import json
+import logging
+import os
+import select
+import time
+from threading import Thread
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy.engine import make_url
+#----------------------------------------------------------------------------#
+# Invalidation bus.
+#----------------------------------------------------------------------------#
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationListener(Thread):
+  """LISTENs on a channel and hands every notification payload to handler.
+
+  One runs per worker process on its own connection. After a reconnect the
+  handler gets {"all": true}, since notifications sent while disconnected
+  are lost.
+  """
+
+  def __init__(self, database_uri, channel, handler, timeout=5):
+    super().__init__(name='invalidation-listener', daemon=True)
+    url = make_url(database_uri).set(drivername='postgresql')
+    self.dsn = url.render_as_string(hide_password=False)
+    self.channel = channel
+    self.handler = handler
+    self.timeout = timeout
+    self.pid = os.getpid()
+
+  def run(self):
+    connected_before = False
+    while True:
+      connection = None
+      try:
+        connection = psycopg2.connect(self.dsn)
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        connection.cursor().execute(f'LISTEN {self.channel}')
+        if connected_before:
+          self.handler({'all': True})
+        connected_before = True
+        self.listen(connection)
+      except Exception:
+        logger.exception('invalidation listener lost its connection')
+        if connection is not None:
+          connection.close()
+        time.sleep(self.timeout)
+
+  def listen(self, connection):
+    while True:
+      if select.select([connection], [], [], self.timeout) == ([], [], []):
+        continue
+      connection.poll()
+      while connection.notifies:
+        notify = connection.notifies.pop(0)
+        try:
+          self.handler(json.loads(notify.payload))
+        except Exception:
+          logger.exception('could not handle invalidation %r', notify.payload)
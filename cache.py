@@ -0,0 +1,176 @@
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from flask import current_app, request, session
+from replicas import served_from_replica, wrote_recently
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+def venue_key(venue_id):
+  return f'venue:{venue_id}'
+
+def artist_key(artist_id):
+  return f'artist:{artist_id}'
+
+
+class MemoryBackend:
+  """Per-process LRU with a TTL on every entry."""
+
+  def __init__(self, maxsize=1024, ttl=60):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.evictions = 0
+    self._lock = Lock()
+    self._entries = OrderedDict()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      value, expires = entry
+      if expires < time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    with self._lock:
+      self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+        self.evictions += 1
+
+  def delete(self, *keys):
+    with self._lock:
+      for key in keys:
+        self._entries.pop(key, None)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+
+class RedisBackend:
+  """Cache shared by every worker, kept in Redis; needs the redis package."""
+
+  def __init__(self, url, ttl=60, prefix='fyyur:page:'):
+    import redis
+    self.client = redis.Redis.from_url(url)
+    self.ttl = ttl
+    self.prefix = prefix
+    # Redis evicts on its own terms; see its evicted_keys stat.
+    self.evictions = 0
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    return value.decode() if value is not None else None
+
+  def set(self, key, value, ttl=None):
+    self.client.setex(self.prefix + key, int(self.ttl if ttl is None else ttl), value)
+
+  def delete(self, *keys):
+    if keys:
+      self.client.delete(*[self.prefix + key for key in keys])
+
+  def clear(self):
+    keys = list(self.client.scan_iter(self.prefix + '*'))
+    if keys:
+      self.client.delete(*keys)
+
+
+class PageCache:
+  """Cache of rendered pages, keyed by the records they show.
+
+  PAGE_CACHE selects the backend: 'memory', 'redis' (PAGE_CACHE_URL) or
+  anything else to turn caching off. Write handlers call invalidate() with
+  the keys of every page their change shows up on.
+
+  A client that has just written reads past the cache, as it reads past
+  the replicas, and a page rendered from a replica is kept only for as
+  long as it can take to go stale for such a client: REPLICA_STICKY_SECONDS
+  less REPLICA_LAG_SECONDS.
+  """
+
+  def __init__(self, app=None):
+    self.backend = None
+    self.replica_ttl = 0
+    self.hits = 0
+    self.misses = 0
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    kind = app.config.get('PAGE_CACHE')
+    ttl = app.config.get('PAGE_CACHE_TTL', 60)
+    if kind == 'memory':
+      self.backend = MemoryBackend(app.config.get('PAGE_CACHE_SIZE', 1024), ttl)
+    elif kind == 'redis':
+      self.backend = RedisBackend(app.config['PAGE_CACHE_URL'], ttl)
+    self.replica_ttl = min(ttl, app.config.get('REPLICA_STICKY_SECONDS', 5)
+                           - app.config.get('REPLICA_LAG_SECONDS', 1))
+    app.extensions['page_cache'] = self
+
+  def serve(self, key, view, kwargs):
+    """view(**kwargs), from the cache under key(**kwargs) when it can."""
+    if not self.usable():
+      return view(**kwargs)
+    cache_key = key(**kwargs)
+    page = self.get(cache_key)
+    if page is None:
+      page = view(**kwargs)
+      if isinstance(page, str):
+        self.set(cache_key, page, self.replica_ttl if served_from_replica() else None)
+    return page
+
+  def usable(self):
+    """Whether the current request may be served from the cache.
+
+    Requests with pending flashed messages bypass it, since those messages
+    are part of the rendered page, and so do those of a client that has
+    just written, which may not have reached the page cached yet.
+    """
+    return self.backend is not None and request.method == 'GET' and not session.get('_flashes') \
+      and not wrote_recently()
+
+  def get(self, key):
+    page = self.backend.get(key)
+    if page is None:
+      self.misses += 1
+    else:
+      self.hits += 1
+    return page
+
+  def set(self, key, page, ttl=None):
+    # a page that may already be stale is not worth keeping
+    if ttl is None or ttl > 0:
+      self.backend.set(key, page, ttl)
+
+  def invalidate(self, *keys):
+    if self.backend is not None:
+      self.backend.delete(*keys)
+
+  def clear(self):
+    if self.backend is not None:
+      self.backend.clear()
+
+  def stats(self):
+    return {
+      'backend': type(self.backend).__name__ if self.backend else None,
+      'hits': self.hits,
+      'misses': self.misses,
+      'evictions': self.backend.evictions if self.backend else 0,
+    }
+
+def cached(key):
+  """Serve a view from the current app's page cache under key(**view_args) when it can."""
+  def decorator(view):
+    @wraps(view)
+    def wrapper(**kwargs):
+      return current_app.extensions['page_cache'].serve(key, view, kwargs)
+    return wrapper
+  return decorator
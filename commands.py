@@ -0,0 +1,146 @@
+import os
+import sys
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from models import db, notify_invalidate_all
+from pages import clear_caches
+import seed
+import stats
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+# The modules only a command needs are imported when it runs, so that serving
+# requests never loads them.
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['venue', 'artist', 'show']))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']),
+  help='Input format; guessed from the file extension by default.')
+@click.option('--batch-size', default=5000, show_default=True)
+@click.option('--strict', is_flag=True, help='Import nothing if any row is rejected.')
+@with_appcontext
+def import_command(kind, file, format, batch_size, strict):
+  """Bulk load venues, artists or shows from CSV or NDJSON."""
+  from importer import import_rows, read_rows
+  format = format or ('csv' if file.name.endswith('.csv') else 'ndjson')
+  imported, rejected = import_rows(kind, read_rows(file, format), batch_size)
+  if strict and rejected:
+    db.session.rollback()
+    click.echo(f'{rejected} rows rejected, nothing imported.')
+    sys.exit(1)
+  if kind == 'show':
+    stats.rebuild(db.session.connection())
+  notify_invalidate_all()
+  db.session.commit()
+  clear_caches()
+  click.echo(f'{imported} rows imported, {rejected} rejected.')
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(['venue', 'artist', 'show']))
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True), default='-')
+@click.option('--format', type=click.Choice(['csv', 'ndjson', 'parquet']), default='csv', show_default=True)
+@click.option('--since', type=click.DateTime(), help='Only rows updated after this time.')
+@click.option('--watermark-file', type=click.Path(dir_okay=False),
+  help='Read --since from this file and store the new watermark in it afterwards.')
+@with_appcontext
+def export_command(kind, output, format, since, watermark_file):
+  """Dump venues, artists or shows, optionally only those changed since a watermark."""
+  from exporter import copy_csv, iter_ndjson, watermark, write_parquet
+  if format == 'parquet':
+    try:
+      import pyarrow
+    except ImportError:
+      raise click.UsageError('--format parquet needs the pyarrow package (pip install pyarrow).')
+  if watermark_file and since is None and os.path.exists(watermark_file):
+    with open(watermark_file) as f:
+      since = datetime.fromisoformat(f.read().strip())
+  until = watermark(kind, since)
+  if format == 'parquet':
+    write_parquet(kind, output, since, until)
+  else:
+    with click.open_file(output, 'w', encoding='utf-8') as out:
+      if format == 'csv':
+        copy_csv(kind, out, since, until)
+      else:
+        for chunk in iter_ndjson(kind, since, until):
+          out.write(chunk)
+  db.session.rollback()
+  if watermark_file and until is not None:
+    with open(watermark_file, 'w') as f:
+      f.write(until.isoformat())
+
+@click.command('seed')
+@click.option('--scale', type=click.Choice(seed.SCALES), default='1k', show_default=True,
+  help='Number of shows, with venues and artists in proportion.')
+@click.option('--venues', type=int, help='Override the number of venues of the scale.')
+@click.option('--artists', type=int, help='Override the number of artists of the scale.')
+@click.option('--shows', type=int, help='Override the number of shows of the scale.')
+@click.option('--seed', 'seed_value', default=0, show_default=True, help='The same seed gives the same data.')
+@with_appcontext
+def seed_command(scale, venues, artists, shows, seed_value):
+  """Fill the database with synthetic venues, artists and shows."""
+  default_venues, default_artists, default_shows = seed.SCALES[scale]
+  added = seed.generate(db.session.connection(), venues or default_venues, artists or default_artists,
+    shows or default_shows, seed_value)
+  notify_invalidate_all()
+  db.session.commit()
+  clear_caches()
+  click.echo('{} venues, {} artists and {} shows added.'.format(*added))
+
+@click.command('assets')
+@with_appcontext
+def assets_command():
+  """Minify, fingerprint and compress static/ for STATIC_BUILD; run it on every deploy."""
+  from assets import BUILD_DIR, build
+  manifest = build(current_app.static_folder)
+  compressed = sum(bool(encodings) for encodings in manifest['compressed'].values())
+  click.echo(f'{len(manifest["files"])} files built into static/{BUILD_DIR}, {compressed} of them precompressed.')
+
+stats_cli = AppGroup('stats', help='Per-venue and per-artist show statistics.')
+
+@stats_cli.command('roll')
+def stats_roll_command():
+  """Recount the stats whose next show has started; run it every few minutes."""
+  rolled = stats.roll_forward(db.session.connection())
+  db.session.commit()
+  click.echo(f'{rolled} stats rows rolled forward.')
+
+@stats_cli.command('rebuild')
+def stats_rebuild_command():
+  """Recount the stats of every venue and artist."""
+  stats.rebuild(db.session.connection())
+  db.session.commit()
+
+shows_cli = AppGroup('shows', help='Monthly partitions of the show table.')
+
+@shows_cli.command('partitions')
+@click.option('--ahead', default=12, show_default=True, help='Months after this one to create.')
+def shows_partitions_command(ahead):
+  """Create the partitions of this month and the months ahead; run it monthly."""
+  import partitions
+  names = partitions.create_partitions(db.session.connection(), ahead)
+  db.session.commit()
+  click.echo(f'{len(names)} partitions in place, up to {names[-1]}.')
+
+@shows_cli.command('archive')
+@click.option('--before', type=click.DateTime(), required=True,
+  help='Archive the months before the month of this date.')
+@click.option('--move', is_flag=True, help='Move the rows into show_archive and drop the partitions.')
+def shows_archive_command(before, move):
+  """Take old months of shows out of the show table."""
+  import partitions
+  archived = partitions.archive_partitions(db.session.connection(), before, move)
+  if archived:
+    # archived shows no longer count as past shows
+    stats.rebuild(db.session.connection())
+    notify_invalidate_all()
+  db.session.commit()
+  clear_caches()
+  click.echo(f'{len(archived)} partitions archived: {", ".join(archived) or "none"}.')
+
+# added to the app by create_app()
+COMMANDS = (import_command, export_command, seed_command, assets_command, stats_cli, shows_cli)
@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from flask import current_app
+from models import Venue, Artist, Show, db
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+MODELS = {'venue': Venue, 'artist': Artist, 'show': Show}
+
+def export_query(kind, since=None, until=None, flatten=False):
+  """Rows of a table with since < updated_at <= until, either bound optional.
+
+  With flatten, list columns such as genres come back joined with ';' and
+  booleans as 'true'/'false', as CSV files for 'flask import' expect them.
+  """
+  model = MODELS[kind]
+  columns = model.__table__.columns
+  if flatten:
+    columns = [flat(column) for column in columns]
+  query = db.session.query(*columns)
+  if since is not None:
+    query = query.filter(model.updated_at > since)
+  if until is not None:
+    query = query.filter(model.updated_at <= until)
+  return query.order_by(model.id)
+
+def flat(column):
+  if isinstance(column.type, db.ARRAY):
+    return db.func.array_to_string(column, ';').label(column.name)
+  if isinstance(column.type, db.Boolean):
+    return db.cast(column, db.String).label(column.name)
+  return column
+
+def iter_rows(kind, since=None, until=None, batch=5000, flatten=False):
+  """Rows as dicts, read through a server-side cursor batch rows at a time."""
+  for row in export_query(kind, since, until, flatten).yield_per(batch):
+    yield row._asdict()
+
+def iter_csv(kind, since=None, until=None, batch=5000):
+  """CSV text in chunks of batch rows, laid out like copy_csv() writes it."""
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow([column.name for column in MODELS[kind].__table__.columns])
+  for count, row in enumerate(iter_rows(kind, since, until, batch, flatten=True), start=1):
+    writer.writerow(row.values())
+    if count % batch == 0:
+      yield buffer.getvalue()
+      buffer.seek(0)
+      buffer.truncate()
+  yield buffer.getvalue()
+
+def iter_ndjson(kind, since=None, until=None, batch=5000):
+  lines = []
+  for row in iter_rows(kind, since, until, batch):
+    lines.append(json.dumps(row, default=str))
+    if len(lines) == batch:
+      yield '\n'.join(lines) + '\n'
+      lines = []
+  if lines:
+    yield '\n'.join(lines) + '\n'
+
+def copy_csv(kind, out, since=None, until=None):
+  """Write CSV with COPY ... TO STDOUT, the fastest path when nothing is reshaped."""
+  query = export_query(kind, since, until, flatten=True)
+  statement = query.statement.compile(dialect=db.session.bind.dialect)
+  cursor = db.session.connection().connection.cursor()
+  sql = cursor.mogrify(str(statement), statement.params).decode()
+  cursor.copy_expert(f'COPY ({sql}) TO STDOUT WITH CSV HEADER', out)
+
+def write_parquet(kind, path, since=None, until=None, batch=50000):
+  """Write a Parquet file one row group per batch; needs the pyarrow package."""
+  import pyarrow
+  import pyarrow.parquet
+  writer = None
+  rows = []
+  def flush():
+    nonlocal writer
+    table = pyarrow.Table.from_pylist(rows)
+    if writer is None:
+      writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+    writer.write_table(table)
+    rows.clear()
+  try:
+    for row in iter_rows(kind, since, until, batch):
+      rows.append(row)
+      if len(rows) == batch:
+        flush()
+    if rows:
+      flush()
+  finally:
+    if writer is not None:
+      writer.close()
+
+def watermark(kind, since=None, margin=None):
+  """The newest updated_at after since, but no later than margin ago; export
+  up to it and resume from it next time.
+
+  updated_at is the time its writing transaction started, so a row may
+  commit with an updated_at below a watermark taken meanwhile. Holding the
+  watermark margin (EXPORT_MARGIN_SECONDS) back guarantees that every row
+  is exported exactly once, as long as the transaction that wrote it took
+  less than margin to commit and reach the database the export reads from.
+  """
+  model = MODELS[kind]
+  if margin is None:
+    margin = timedelta(seconds=current_app.config.get('EXPORT_MARGIN_SECONDS', 300))
+  query = db.session.query(db.func.least(db.func.max(model.updated_at), db.func.localtimestamp() - margin))
+  if since is not None:
+    query = query.filter(model.updated_at > since)
+  newest = query.scalar()
+  if newest is None or (since is not None and newest < since):
+    return since
+  return newest
@@ -6,13 +6,17 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+        # the budgeted views are checked against TEST_DATABASE_URL when it is set
+        result = local("python -m compileall -q . && python -m pytest -q tests", capture=True)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def smoke():
+    # needs a migrated, seeded database (flask seed)
+    local("python benchmarks/load_bench.py --smoke")
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -40,7 +44,7 @@ def heroku():
 
 def heroku_test():
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run python benchmarks/load_bench.py --smoke"
     )
 
 
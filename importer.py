@@ -0,0 +1,186 @@
+import csv
+import json
+import sys
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm
+from models import Venue, Artist, Show, db, city_key, locate
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+FORMS = {'venue': VenueForm, 'artist': ArtistForm, 'show': ShowForm}
+MODELS = {'venue': Venue, 'artist': Artist, 'show': Show}
+
+def read_rows(stream, format):
+  """Yield (line, row) from a CSV file with a header or from NDJSON.
+
+  In CSV, list fields such as genres are separated with ';'.
+  """
+  if format == 'csv':
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+      if 'genres' in row:
+        row['genres'] = [genre for genre in row['genres'].split(';') if genre]
+      yield line, row
+  else:
+    for line, text in enumerate(stream, start=1):
+      if text.strip():
+        try:
+          yield line, json.loads(text)
+        except ValueError:
+          yield line, None
+
+# Checkbox fields, and the spellings of false they may come with in a file.
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+FALSE_VALUES = ('', 'f', 'false', 'n', 'no', '0', 'none')
+
+def formdata(row):
+  """Shape a row like a submitted form, so the forms validate it the same way."""
+  data = MultiDict()
+  for key, value in row.items():
+    for item in (value if isinstance(value, list) else [value]):
+      if key in BOOLEAN_FIELDS:
+        item = 'false' if item is None or str(item).lower() in FALSE_VALUES else 'y'
+      data.add(key, '' if item is None else str(item))
+  return data
+
+def validate(kind, row):
+  """Return (values, errors) for one row, checked by the form of its kind."""
+  if not isinstance(row, dict):
+    return None, {'row': ['Not a JSON object.']}
+  form = FORMS[kind](formdata=formdata(row), meta={'csrf': False})
+  if not form.validate():
+    return None, form.errors
+  table = MODELS[kind].__table__
+  values = {}
+  for column in table.columns:
+    if column.name not in form.data:
+      continue
+    value = form.data[column.name]
+    if isinstance(column.type, db.String) and isinstance(value, bool):
+      value = str(value)
+    values[column.name] = value
+  if kind == 'show':
+    try:
+      values['artist_id'] = int(values['artist_id'])
+      values['venue_id'] = int(values['venue_id'])
+    except (TypeError, ValueError):
+      return None, {'artist_id/venue_id': ['Not an id.']}
+    # exported shows carry their end_time, new ones may give a duration
+    if row.get('end_time') and not row.get('duration'):
+      try:
+        values['end_time'] = datetime.fromisoformat(str(row['end_time']))
+      except ValueError:
+        return None, {'end_time': ['Not a date and time.']}
+      if values['end_time'] <= values['start_time']:
+        return None, {'end_time': ['Not after start_time.']}
+    else:
+      values['end_time'] = values['start_time'] + timedelta(minutes=form.duration.data)
+  elif row.get('id'):
+    try:
+      values['id'] = int(row['id'])
+    except ValueError:
+      return None, {'id': ['Not an id.']}
+  return values, None
+
+def missing_references(batch):
+  """Drop shows whose artist or venue does not exist; return their (line, errors)."""
+  artist_ids = {values['artist_id'] for _, values in batch}
+  venue_ids = {values['venue_id'] for _, values in batch}
+  artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+  venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+  errors = []
+  for line, values in batch:
+    if values['artist_id'] not in artists:
+      errors.append((line, {'artist_id': ['No such artist.']}))
+    if values['venue_id'] not in venues:
+      errors.append((line, {'venue_id': ['No such venue.']}))
+  bad = {line for line, _ in errors}
+  batch[:] = [(line, values) for line, values in batch if line not in bad]
+  return errors
+
+def assign_locations(batch, locations):
+  """Set location_id and the location's spellings on venue or artist rows.
+
+  locations caches locate() results by (state, city key) across batches.
+  """
+  connection = db.session.connection()
+  for _, values in batch:
+    key = (values['state'].strip().upper(), city_key(values['city']))
+    if key not in locations:
+      locations[key] = locate(connection, values['city'], values['state'])
+    values['location_id'], values['city'], values['state'] = locations[key]
+
+def insert_shows(table, values):
+  """Insert shows, skipping those whose slot overlaps a booked one; returns how many went in.
+
+  The exclusion constraints of each show partition let ON CONFLICT skip
+  overlaps within a month. Those across a month boundary are caught by a
+  trigger that raises instead, so on that error the batch is retried one
+  show at a time.
+  """
+  statement = insert(table).on_conflict_do_nothing().returning(table.c.id)
+  try:
+    with db.session.begin_nested():
+      return len(db.session.execute(statement.values(values)).all())
+  except IntegrityError:
+    inserted = 0
+    for row in values:
+      try:
+        with db.session.begin_nested():
+          inserted += len(db.session.execute(statement.values(row)).all())
+      except IntegrityError:
+        pass
+    return inserted
+
+def import_rows(kind, rows, batch_size=5000, err=sys.stderr):
+  """Validate and insert rows in batches inside one transaction.
+
+  Rows that fail validation are reported to err and skipped; the others go
+  in with one multi-row INSERT per batch. Shows overlapping a booked slot of
+  their venue or artist are skipped as well. Returns (imported, rejected);
+  the caller commits or rolls back.
+  """
+  table = MODELS[kind].__table__
+  imported = rejected = 0
+  locations = {}
+  rows = iter(rows)
+  while True:
+    chunk = list(islice(rows, batch_size))
+    if not chunk:
+      break
+    batch, errors = [], []
+    for line, row in chunk:
+      values, row_errors = validate(kind, row)
+      if row_errors:
+        errors.append((line, row_errors))
+      else:
+        batch.append((line, values))
+    if kind == 'show' and batch:
+      errors.extend(missing_references(batch))
+    elif batch:
+      assign_locations(batch, locations)
+    for line, row_errors in errors:
+      for field, messages in row_errors.items():
+        print(f'line {line}: {field}: {" ".join(messages)}', file=err)
+    rejected += len({line for line, _ in errors})
+    # rows with and without an explicit id need separate statements
+    for with_id in (True, False):
+      values = [values for _, values in batch if ('id' in values) == with_id]
+      if values and kind == 'show':
+        inserted = insert_shows(table, values)
+        if inserted < len(values):
+          print(f'{len(values) - inserted} shows skipped: their slot overlaps a booked show.', file=err)
+        imported += inserted
+        rejected += len(values) - inserted
+      elif values:
+        db.session.execute(table.insert(), values)
+        imported += len(values)
+  if kind != 'show':
+    db.session.execute(db.text(
+      f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+      f"coalesce(max(id), 0) + 1, false) FROM {table.name}"))
+  return imported, rejected
@@ -0,0 +1,24 @@
+"""show listing index
+
+Revision ID: 0b7e2f6ac1d3
+Revises: 54ce3b229059
+Create Date: 2026-10-18 09:40:02.551930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e2f6ac1d3'
+down_revision = '54ce3b229059'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='show')
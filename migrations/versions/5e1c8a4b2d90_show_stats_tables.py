@@ -0,0 +1,50 @@
+"""show stats tables
+
+Revision ID: 5e1c8a4b2d90
+Revises: 3f6a2d9e71c4
+Create Date: 2026-10-18 14:20:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1c8a4b2d90'
+down_revision = '3f6a2d9e71c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, parent in (('venue_stats', 'venue'), ('artist_stats', 'artist')):
+        key = f'{parent}_id'
+        op.create_table(table,
+            sa.Column(key, sa.Integer(), nullable=False),
+            sa.Column('past_shows_count', sa.Integer(), nullable=False),
+            sa.Column('upcoming_shows_count', sa.Integer(), nullable=False),
+            sa.Column('next_show_time', sa.DateTime(), nullable=True),
+            sa.Column('last_show_time', sa.DateTime(), nullable=True),
+            sa.Column('counted_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint([key], [f'{parent}.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(key)
+        )
+        op.create_index(f'ix_{table}_next_show_time', table, ['next_show_time'], unique=False)
+        op.execute(f'''
+            INSERT INTO {table} ({key}, past_shows_count, upcoming_shows_count,
+                                 next_show_time, last_show_time, counted_at)
+            SELECT p.id,
+                   count(s.id) FILTER (WHERE s.start_time <= now()::timestamp),
+                   count(s.id) FILTER (WHERE s.start_time > now()::timestamp),
+                   min(s.start_time) FILTER (WHERE s.start_time > now()::timestamp),
+                   max(s.start_time) FILTER (WHERE s.start_time <= now()::timestamp),
+                   now()::timestamp
+            FROM {parent} p LEFT JOIN show s ON s.{key} = p.id
+            GROUP BY p.id
+        ''')
+
+
+def downgrade():
+    for table in ('artist_stats', 'venue_stats'):
+        op.drop_index(f'ix_{table}_next_show_time', table_name=table)
+        op.drop_table(table)
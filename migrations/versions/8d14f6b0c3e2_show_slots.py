@@ -0,0 +1,51 @@
+"""show slots
+
+Revision ID: 8d14f6b0c3e2
+Revises: c2b95f0e7a31
+Create Date: 2026-10-18 16:31:57.260184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d14f6b0c3e2'
+down_revision = 'c2b95f0e7a31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # existing shows get two hours, cut short where the venue or the artist
+    # has a later show sooner, so that they satisfy the constraints below;
+    # shows sharing a start time end up empty and never overlap anything
+    op.execute('''
+        UPDATE show SET end_time = slots.end_time
+        FROM (
+            SELECT id, least(
+                start_time + interval '2 hours',
+                lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id),
+                lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id)
+            ) AS end_time
+            FROM show
+        ) AS slots
+        WHERE show.id = slots.id
+    ''')
+    op.alter_column('show', 'end_time', nullable=False)
+    # new shows must have a non-empty slot; existing empty ones are left alone
+    op.execute('ALTER TABLE show ADD CONSTRAINT ck_show_end_after_start CHECK (end_time > start_time) NOT VALID')
+    for owner in ('venue', 'artist'):
+        op.execute(
+            f'ALTER TABLE show ADD CONSTRAINT ex_show_{owner}_slot '
+            f'EXCLUDE USING gist ({owner}_id WITH =, tsrange(start_time, end_time) WITH &&)'
+        )
+
+
+def downgrade():
+    for owner in ('artist', 'venue'):
+        op.drop_constraint(f'ex_show_{owner}_slot', 'show')
+    op.drop_constraint('ck_show_end_after_start', 'show')
+    op.drop_column('show', 'end_time')
@@ -0,0 +1,30 @@
+"""trigram search indexes
+
+Revision ID: 9c41d07e8b52
+Revises: 0b7e2f6ac1d3
+Create Date: 2026-10-18 10:05:17.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41d07e8b52'
+down_revision = '0b7e2f6ac1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venue', 'artist'):
+        op.execute(
+            f"CREATE INDEX ix_{table}_search_trgm ON {table} "
+            f"USING gin ((name || ' ' || city || ' ' || state) gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    op.drop_index('ix_artist_search_trgm', table_name='artist')
+    op.drop_index('ix_venue_search_trgm', table_name='venue')
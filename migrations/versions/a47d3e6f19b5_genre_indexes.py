@@ -0,0 +1,30 @@
+"""genre indexes
+
+Revision ID: a47d3e6f19b5
+Revises: 5e1c8a4b2d90
+Create Date: 2026-10-18 15:02:41.603277
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a47d3e6f19b5'
+down_revision = '5e1c8a4b2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # serve the @> and && genre filters; built without locking out writes
+    with op.get_context().autocommit_block():
+        for table in ('venue', 'artist'):
+            op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False,
+                            postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('artist', 'venue'):
+            op.drop_index(f'ix_{table}_genres', table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,70 @@
+"""location table
+
+Revision ID: c2b95f0e7a31
+Revises: a47d3e6f19b5
+Create Date: 2026-10-18 15:48:12.004519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2b95f0e7a31'
+down_revision = 'a47d3e6f19b5'
+branch_labels = None
+depends_on = None
+
+# enums.State as of this revision
+STATES = ('AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY')
+
+def city_key(column):
+    # must match models.city_key()
+    return f"lower(trim(regexp_replace(replace({column}, '.', ''), '\\s+', ' ', 'g')))"
+
+
+def upgrade():
+    op.create_table('location',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('state', sa.String(length=2), nullable=False),
+        sa.Column('city', sa.String(length=120), nullable=False),
+        sa.Column('city_key', sa.String(length=120), nullable=False),
+        sa.CheckConstraint(f"state IN ({', '.join(map(repr, STATES))})", name='ck_location_state'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('state', 'city_key', name='uq_location_state_city_key')
+    )
+    op.create_index('ix_location_state_city_id', 'location', ['state', 'city', 'id'], unique=False)
+    # one location per state and city key, spelled the way most rows spell it
+    op.execute(f'''
+        INSERT INTO location (state, city, city_key)
+        SELECT state, mode() WITHIN GROUP (ORDER BY city), city_key
+        FROM (
+            SELECT upper(trim(state)) AS state,
+                   regexp_replace(trim(city), '\\s+', ' ', 'g') AS city,
+                   {city_key('city')} AS city_key
+            FROM venue
+            UNION ALL
+            SELECT upper(trim(state)), regexp_replace(trim(city), '\\s+', ' ', 'g'), {city_key('city')}
+            FROM artist
+        ) AS spellings
+        GROUP BY state, city_key
+    ''')
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('location_id', sa.Integer(), nullable=True))
+        op.execute(f'''
+            UPDATE {table} SET location_id = location.id, city = location.city, state = location.state
+            FROM location
+            WHERE location.state = upper(trim({table}.state)) AND location.city_key = {city_key(f'{table}.city')}
+        ''')
+        op.alter_column(table, 'location_id', nullable=False)
+        op.create_foreign_key(f'{table}_location_id_fkey', table, 'location', ['location_id'], ['id'])
+        op.create_index(f'ix_{table}_location_id_id', table, ['location_id', 'id'], unique=False)
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index(f'ix_{table}_location_id_id', table_name=table)
+        op.drop_constraint(f'{table}_location_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'location_id')
+    op.drop_index('ix_location_state_city_id', table_name='location')
+    op.drop_table('location')
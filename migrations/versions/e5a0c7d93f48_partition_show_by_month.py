@@ -0,0 +1,182 @@
+"""partition show by month
+
+Revision ID: e5a0c7d93f48
+Revises: 8d14f6b0c3e2
+Create Date: 2026-10-18 17:12:40.835106
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a0c7d93f48'
+down_revision = '8d14f6b0c3e2'
+branch_labels = None
+depends_on = None
+
+INDEXES = ('ix_show_start_time_id', 'ix_show_venue_id_start_time',
+           'ix_show_artist_id_start_time', 'ix_show_updated_at')
+
+def slot_constraints(table):
+    return (
+        f'ALTER TABLE {table} '
+        f'ADD CONSTRAINT {table}_venue_slot EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&), '
+        f'ADD CONSTRAINT {table}_artist_slot EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+
+# Creates the partition of one month, show_pYYYY_MM, unless it exists. Rows of
+# that month that went to show_default meanwhile are moved into it.
+SHOW_PARTITION = '''
+CREATE FUNCTION show_partition(month timestamp) RETURNS text LANGUAGE plpgsql AS $$
+DECLARE
+    first timestamp := date_trunc('month', month);
+    name text := 'show_p' || to_char(first, 'YYYY_MM');
+BEGIN
+    IF to_regclass(name) IS NOT NULL THEN
+        RETURN name;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE show INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM show_default WHERE start_time >= %L AND start_time < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved', first, first + interval '1 month', name);
+    EXECUTE format(
+        'ALTER TABLE %I '
+        'ADD CONSTRAINT %I EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&), '
+        'ADD CONSTRAINT %I EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)',
+        name, name || '_venue_slot', name || '_artist_slot');
+    EXECUTE format('ALTER TABLE show ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        name, first, first + interval '1 month');
+    RETURN name;
+END
+$$
+'''
+
+# The exclusion constraints only see their own partition. A slot lasts a day
+# at most, so a show can only overlap one in another partition if its slot
+# runs into the next month or it starts on the first day of its month; such
+# shows are checked against the whole table, one at a time per venue and per
+# artist.
+CHECK_ACROSS_PARTITIONS = '''
+CREATE FUNCTION show_slot_across_partitions() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    first timestamp := date_trunc('month', NEW.start_time);
+BEGIN
+    IF NEW.start_time >= first + interval '1 day' AND NEW.end_time <= first + interval '1 month' THEN
+        RETURN NEW;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('show_venue_slot'), NEW.venue_id);
+    IF EXISTS (
+        SELECT 1 FROM show
+        WHERE venue_id = NEW.venue_id AND id <> NEW.id
+          AND start_time > NEW.start_time - interval '1 day' AND start_time < NEW.end_time
+          AND tsrange(start_time, end_time) && tsrange(NEW.start_time, NEW.end_time)
+    ) THEN
+        RAISE EXCEPTION 'venue % already has a show during this slot', NEW.venue_id
+            USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'ex_show_venue_slot';
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('show_artist_slot'), NEW.artist_id);
+    IF EXISTS (
+        SELECT 1 FROM show
+        WHERE artist_id = NEW.artist_id AND id <> NEW.id
+          AND start_time > NEW.start_time - interval '1 day' AND start_time < NEW.end_time
+          AND tsrange(start_time, end_time) && tsrange(NEW.start_time, NEW.end_time)
+    ) THEN
+        RAISE EXCEPTION 'artist % already has a show during this slot', NEW.artist_id
+            USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'ex_show_artist_slot';
+    END IF;
+    RETURN NEW;
+END
+$$
+'''
+
+
+def upgrade():
+    # the old table keeps its data until it is copied over
+    op.execute('ALTER TABLE show RENAME TO show_unpartitioned')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY NONE')
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX {name} RENAME TO {name}_unpartitioned')
+    op.execute('''
+        CREATE TABLE show (
+            id integer NOT NULL DEFAULT nextval('show_id_seq'),
+            artist_id integer NOT NULL REFERENCES artist (id),
+            venue_id integer NOT NULL REFERENCES venue (id),
+            start_time timestamp NOT NULL,
+            end_time timestamp NOT NULL,
+            updated_at timestamp NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, start_time)
+        ) PARTITION BY RANGE (start_time)
+    ''')
+    op.execute('CREATE TABLE show_default PARTITION OF show DEFAULT')
+    op.execute(slot_constraints('show_default'))
+    op.execute(SHOW_PARTITION)
+    op.execute('''
+        SELECT show_partition(month)
+        FROM generate_series(
+            (SELECT date_trunc('month', coalesce(min(start_time), now()::timestamp)) FROM show_unpartitioned),
+            date_trunc('month', now()::timestamp) + interval '12 months',
+            interval '1 month'
+        ) AS month
+    ''')
+    op.execute('''
+        INSERT INTO show (id, artist_id, venue_id, start_time, end_time, updated_at)
+        SELECT id, artist_id, venue_id, start_time, end_time, updated_at FROM show_unpartitioned
+    ''')
+    op.execute('DROP TABLE show_unpartitioned')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_updated_at', 'show', ['updated_at'], unique=False)
+    # shows left with an empty slot by the show slots migration are let be
+    op.execute('ALTER TABLE show ADD CONSTRAINT ck_show_end_after_start CHECK (end_time > start_time) NOT VALID')
+    op.execute("ALTER TABLE show ADD CONSTRAINT ck_show_slot_length CHECK (end_time <= start_time + interval '1 day') NOT VALID")
+    op.execute(CHECK_ACROSS_PARTITIONS)
+    op.execute('''
+        CREATE TRIGGER show_slot_across_partitions BEFORE INSERT OR UPDATE ON show
+        FOR EACH ROW EXECUTE FUNCTION show_slot_across_partitions()
+    ''')
+    # where 'flask shows archive --move' puts the shows of old months
+    op.execute('CREATE TABLE show_archive (LIKE show INCLUDING DEFAULTS)')
+    op.create_index('ix_show_archive_venue_id_start_time', 'show_archive', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_archive_artist_id_start_time', 'show_archive', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    # archived shows come back into the table along with the partitioned ones
+    op.execute('ALTER TABLE show RENAME TO show_partitioned')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY NONE')
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX {name} RENAME TO {name}_partitioned')
+    op.execute('''
+        CREATE TABLE show (
+            id integer NOT NULL DEFAULT nextval('show_id_seq') PRIMARY KEY,
+            artist_id integer NOT NULL REFERENCES artist (id),
+            venue_id integer NOT NULL REFERENCES venue (id),
+            start_time timestamp NOT NULL,
+            end_time timestamp NOT NULL,
+            updated_at timestamp NOT NULL DEFAULT now()
+        )
+    ''')
+    op.execute('''
+        INSERT INTO show (id, artist_id, venue_id, start_time, end_time, updated_at)
+        SELECT id, artist_id, venue_id, start_time, end_time, updated_at FROM show_partitioned
+        UNION ALL
+        SELECT id, artist_id, venue_id, start_time, end_time, updated_at FROM show_archive
+    ''')
+    op.execute('DROP TABLE show_partitioned')
+    op.execute('DROP TABLE show_archive')
+    op.execute('DROP FUNCTION show_slot_across_partitions()')
+    op.execute('DROP FUNCTION show_partition(timestamp)')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_updated_at', 'show', ['updated_at'], unique=False)
+    op.execute('ALTER TABLE show ADD CONSTRAINT ck_show_end_after_start CHECK (end_time > start_time) NOT VALID')
+    for owner in ('venue', 'artist'):
+        op.execute(
+            f'ALTER TABLE show ADD CONSTRAINT ex_show_{owner}_slot '
+            f'EXCLUDE USING gist ({owner}_id WITH =, tsrange(start_time, end_time) WITH &&)'
+        )
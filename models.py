@@ -1,18 +1,54 @@
-from flask_sqlalchemy import SQLAlchemy
+import json
+from itertools import chain
+from flask import current_app
+from replicas import RoutingSQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert
+from enums import State
 # from flask import Flask
 # from flask_moment import Moment
 # from flask_migrate import Migrate
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
+
+def city_key(city):
+    """The spelling-insensitive form of a city name: no dots, single spaces, lower case.
+
+    Matches the expression the location migration backfilled city_key with.
+    """
+    return ' '.join(city.replace('.', '').split()).lower()
+
+class Location(db.Model):
+  """One (state, city) pair; venues and artists in it share its spelling of the city."""
+  __tablename__ = 'location'
+  __table_args__ = (
+    db.UniqueConstraint('state', 'city_key', name='uq_location_state_city_key'),
+    db.Index('ix_location_state_city_id', 'state', 'city', 'id'),
+    db.CheckConstraint(db.column('state').in_([state.value for state in State]), name='ck_location_state'),
+  )
+  id = db.Column(db.Integer, primary_key=True)
+  state = db.Column(db.String(2), nullable=False)
+  city = db.Column(db.String(120), nullable=False)
+  city_key = db.Column(db.String(120), nullable=False)
+
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_search_trgm', db.text("(name || ' ' || city || ' ' || state) gin_trgm_ops"),
+                 postgresql_using='gin'),
+        db.Index('ix_venue_updated_at', 'updated_at'),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_venue_location_id_id', 'location_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
+    # set from city and state on flush, see assign_locations()
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
     facebook_link = db.Column(db.String(120), nullable=False)
@@ -23,7 +59,10 @@ class Venue(db.Model):
     website_link = db.Column(db.String(500), nullable=False)
     seeking_talent = db.Column(db.Boolean, default=False,nullable=True)
     seeking_description = db.Column(db.String(500),nullable=True)
-    shows = db.relationship('Show', backref='venue', lazy='joined', cascade="all, delete")
+    # loaded only when asked for; see LOAD_PROFILES
+    shows = db.relationship('Show', backref='venue', lazy='select', cascade="all, delete")
+    # for incremental exports
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
     
     
     def __repr__(self):
@@ -31,11 +70,19 @@ class Venue(db.Model):
     
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_search_trgm', db.text("(name || ' ' || city || ' ' || state) gin_trgm_ops"),
+                 postgresql_using='gin'),
+        db.Index('ix_artist_updated_at', 'updated_at'),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artist_location_id_id', 'location_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
     genres = db.Column(db.ARRAY(db.String(120)), nullable=False)
     image_link = db.Column(db.String(500), nullable=True)
@@ -45,7 +92,9 @@ class Artist(db.Model):
     website_link = db.Column(db.String(500), nullable=True)
     seeking_venue = db.Column(db.String, nullable=False)
     seeking_description = db.Column(db.String(500),nullable=True)
-    shows = db.relationship('Show', backref='artist', lazy='joined', cascade="all, delete")
+    shows = db.relationship('Show', backref='artist', lazy='select', cascade="all, delete")
+    # for incremental exports
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
     
     def __repr__(self):
       return f'<Artist ID:{self.id} Name:{self.name}>'    
@@ -54,8 +103,174 @@ class Artist(db.Model):
 
 class Show(db.Model):
   __tablename__ = 'show'
-  id = db.Column(db.Integer, primary_key=True)
+  __table_args__ = (
+    # partitioned by month of start_time (see partitions.py), so the key has to
+    # include it; id alone is still unique and identifies a show
+    db.PrimaryKeyConstraint('id', 'start_time'),
+    db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_show_updated_at', 'updated_at'),
+    # no venue or artist is booked for two overlapping slots: each partition
+    # has exclusion constraints on (venue_id, slot) and (artist_id, slot),
+    # whose GiST indexes also serve slot_conflicts(), and a trigger checks
+    # the slots near a month boundary across partitions
+    db.CheckConstraint('end_time > start_time', name='ck_show_end_after_start'),
+    db.CheckConstraint("end_time <= start_time + interval '1 day'", name='ck_show_slot_length'),
+    {'postgresql_partition_by': 'RANGE (start_time)'},
+  )
+  id = db.Column(db.Integer, autoincrement=True)
   artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
   venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
   start_time = db.Column(db.DateTime, nullable=False)
-  # upcoming = db.Column(db.Boolean, nullable=False, default=False)
\ No newline at end of file
+  end_time = db.Column(db.DateTime, nullable=False)
+  updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
+  # upcoming = db.Column(db.Boolean, nullable=False, default=False)
+  __mapper_args__ = {'primary_key': [id]}
+
+# Show counts per venue and per artist, split at counted_at, so pages read
+# them from one row. stats.py keeps them current; a row whose next_show_time
+# has passed is rolled forward by 'flask stats roll'.
+
+class VenueStats(db.Model):
+  __tablename__ = 'venue_stats'
+  __table_args__ = (
+    db.Index('ix_venue_stats_next_show_time', 'next_show_time'),
+  )
+  venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+  past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+  next_show_time = db.Column(db.DateTime, nullable=True)
+  last_show_time = db.Column(db.DateTime, nullable=True)
+  counted_at = db.Column(db.DateTime, nullable=False)
+
+class ArtistStats(db.Model):
+  __tablename__ = 'artist_stats'
+  __table_args__ = (
+    db.Index('ix_artist_stats_next_show_time', 'next_show_time'),
+  )
+  artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+  past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+  next_show_time = db.Column(db.DateTime, nullable=True)
+  last_show_time = db.Column(db.DateTime, nullable=True)
+  counted_at = db.Column(db.DateTime, nullable=False)
+
+#----------------------------------------------------------------------------#
+# Load profiles.
+#----------------------------------------------------------------------------#
+
+class LoadProfile:
+  """The columns and relationships one use of a venue or artist reads."""
+
+  def __init__(self, columns, relationships=()):
+    self.columns = tuple(columns)
+    self.relationships = tuple(relationships)
+
+  def options(self):
+    # a relationship the profile does not load raises when touched, rather
+    # than running a query per object
+    return (db.load_only(*self.columns), *self.relationships, db.raiseload('*'))
+
+def venue_profiles():
+  form = (Venue.id, Venue.name, Venue.genres, Venue.address, Venue.city, Venue.state, Venue.phone,
+          Venue.website_link, Venue.facebook_link, Venue.seeking_talent, Venue.seeking_description,
+          Venue.image_link)
+  return {
+    # listings and "load more" pages
+    'card': LoadProfile((Venue.id, Venue.name)),
+    # edit form, GET and POST
+    'form': LoadProfile(form),
+    # venue page; its shows are paged by queries.venue_shows()
+    'detail': LoadProfile(form),
+    # the shows go with the venue, so they are loaded in the same query
+    'delete': LoadProfile((Venue.id,), (db.joinedload(Venue.shows),)),
+  }
+
+def artist_profiles():
+  form = (Artist.id, Artist.name, Artist.genres, Artist.city, Artist.state, Artist.phone,
+          Artist.website_link, Artist.facebook_link, Artist.seeking_venue, Artist.seeking_description,
+          Artist.image_link)
+  return {
+    'card': LoadProfile((Artist.id, Artist.name)),
+    'form': LoadProfile(form),
+    'detail': LoadProfile(form),
+  }
+
+LOAD_PROFILES = {Venue: venue_profiles(), Artist: artist_profiles()}
+
+def load_profile(model, name):
+  """The named LoadProfile of model; its columns also serve db.select() and session.query()."""
+  return LOAD_PROFILES[model][name]
+
+def profiled(model, name):
+  """model.query loading what the named profile lists, e.g. profiled(Venue, 'form').get(id)."""
+  return model.query.options(*load_profile(model, name).options())
+
+#----------------------------------------------------------------------------#
+# Locations.
+#----------------------------------------------------------------------------#
+
+def locate(connection, city, state):
+    """(id, city, state) of the location of city and state, created on first use."""
+    state = state.strip().upper()
+    key = city_key(city)
+    connection.execute(insert(Location).values(state=state, city=' '.join(city.split()), city_key=key)
+                       .on_conflict_do_nothing(index_elements=['state', 'city_key']))
+    return connection.execute(db.select(Location.id, Location.city, Location.state)
+                              .where(Location.state == state, Location.city_key == key)).one()
+
+@event.listens_for(db.session, 'before_flush')
+def assign_locations(session, flush_context, instances):
+    # venues and artists take the city spelling of their location, so that
+    # 'new york' and 'New York ' end up in the same area
+    for obj in chain(session.new, session.dirty):
+        if not isinstance(obj, (Venue, Artist)):
+            continue
+        state = inspect(obj)
+        if obj in session.new or state.attrs.city.history.has_changes() \
+                or state.attrs.state.history.has_changes():
+            obj.location_id, obj.city, obj.state = locate(session.connection(), obj.city, obj.state)
+
+#----------------------------------------------------------------------------#
+# Invalidation events.
+#----------------------------------------------------------------------------#
+
+# Channel of the NOTIFY sent with every flush that touches a venue, artist or
+# show, when INVALIDATION_BUS is on. The payload names the venue and artist
+# ids whose pages changed, or is {"all": true} when it would not fit.
+INVALIDATION_CHANNEL = 'fyyur_invalidate'
+MAX_PAYLOAD = 7900
+
+@event.listens_for(db.session, 'after_flush')
+def notify_invalidation(session, flush_context):
+    if not current_app.config.get('INVALIDATION_BUS'):
+        return
+    venues, artists = set(), set()
+    connection = session.connection()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Venue):
+            venues.add(obj.id)
+            if obj in session.dirty:
+                artists.update(id for id, in connection.execute(
+                    db.select(Show.artist_id).where(Show.venue_id == obj.id).distinct()))
+        elif isinstance(obj, Artist):
+            artists.add(obj.id)
+            if obj in session.dirty:
+                venues.update(id for id, in connection.execute(
+                    db.select(Show.venue_id).where(Show.artist_id == obj.id).distinct()))
+        elif isinstance(obj, Show):
+            venues.add(obj.venue_id)
+            artists.add(obj.artist_id)
+    if not venues and not artists:
+        return
+    payload = json.dumps({'venues': sorted(venues), 'artists': sorted(artists)})
+    if len(payload) > MAX_PAYLOAD:
+        payload = json.dumps({'all': True})
+    # delivered to listeners when the transaction commits, dropped on rollback
+    connection.execute(db.select(db.func.pg_notify(INVALIDATION_CHANNEL, payload)))
+
+def notify_invalidate_all():
+    """Tell every worker to drop its caches, for bulk writes made without the ORM."""
+    if current_app.config.get('INVALIDATION_BUS'):
+        db.session.execute(db.select(db.func.pg_notify(INVALIDATION_CHANNEL, json.dumps({'all': True}))))
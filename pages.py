@@ -0,0 +1,711 @@
+import hmac
+import os
+import sys
+from datetime import datetime, timedelta
+from flask import (
+  Blueprint, Response, abort, current_app, flash, jsonify, redirect, render_template, request,
+  stream_with_context, url_for
+)
+from sqlalchemy.exc import IntegrityError
+from forms import VenueForm, ArtistForm, ShowForm
+import api
+import models
+from enums import Genre, State
+from models import Venue, Artist, Show, db, city_key, load_profile, profiled
+from areas import AreaIndex, group_areas, iter_areas
+from queries import (
+  show_counts, venue_shows, artist_shows, show_listing, iter_show_listing, search, decode_cursor,
+  venue_artist_ids, artist_venue_ids, genre_filter, genre_facets, location_filter, venue_area_statement
+)
+from cache import MemoryBackend, PageCache, cached, venue_key, artist_key
+from pool import pool_stats as engine_pool_stats
+from budgets import budget
+#----------------------------------------------------------------------------#
+# Pages.
+#----------------------------------------------------------------------------#
+
+pages = Blueprint('pages', __name__)
+
+def init_app(app):
+  """Give app its own page cache, genre facet cache and venue area index."""
+  PageCache(app)
+  # genre facet counts by facet_key(); dropped on every write
+  app.extensions['facet_cache'] = MemoryBackend(maxsize=256, ttl=300)
+  app.extensions['area_index'] = AreaIndex()
+
+def page_cache():
+  return current_app.extensions['page_cache']
+
+def facet_cache():
+  return current_app.extensions['facet_cache']
+
+def area_index():
+  return current_app.extensions['area_index']
+
+#----------------------------------------------------------------------------#
+# Invalidation bus.
+#----------------------------------------------------------------------------#
+
+def invalidate(*keys):
+  # drop the cached pages and API ETags of the given records
+  page_cache().invalidate(*keys)
+  api.forget(*keys)
+  facet_cache().clear()
+
+def clear_caches():
+  # after writes that bypass the ORM, such as bulk loads
+  page_cache().clear()
+  api.forget_all()
+  facet_cache().clear()
+  area_index().invalidate()
+
+def handle_invalidation(event):
+  # evict what another worker's write changed; see models.notify_invalidation
+  if event.get('all'):
+    clear_caches()
+    return
+  if event['venues']:
+    area_index().invalidate()
+  invalidate(*map(venue_key, event['venues']), *map(artist_key, event['artists']))
+
+@pages.before_app_request
+def start_listener():
+  # started lazily so that every forked worker runs its own listener
+  app = current_app._get_current_object()
+  listener = app.extensions.get('invalidation_listener')
+  if app.config.get('INVALIDATION_BUS') and (listener is None or listener.pid != os.getpid()):
+    from bus import InvalidationListener
+    def handle(event):
+      # on the listener's thread, which has no app context of its own
+      with app.app_context():
+        handle_invalidation(event)
+    listener = app.extensions['invalidation_listener'] = InvalidationListener(
+      app.config['LISTEN_DATABASE_URL'], models.INVALIDATION_CHANNEL, handle)
+    listener.start()
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+@pages.app_template_filter('datetime')
+def format_datetime(value, format='medium'):
+  import babel.dates
+  import dateutil.parser
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+def stream_page(template_name, **context):
+  # render_template() that sends the page as it is generated, so listings
+  # backed by a server-side cursor start arriving before the query finishes
+  current_app.update_template_context(context)
+  template = current_app.jinja_env.get_template(template_name)
+  return Response(stream_with_context(template.generate(context)))
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@pages.route('/')
+@budget(0)
+def index():
+  return render_template('pages/home.html')
+
+#  ----------------------------------------------------------------
+
+@pages.route('/venues')
+@budget(2)
+@db.read_only
+def venues():
+  # one ordered query for every venue, grouped into areas in Python
+  filters = request_filters()
+  facets = cached_facets(Venue, filters)
+  if current_app.config.get('AREA_INDEX') and not any(filters.values()):
+    data = area_index().listing(venue_area_rows)
+  elif current_app.config.get('STREAM_LISTINGS'):
+    result = db.session.execute(venue_area_statement(**filters), execution_options={'stream_results': True})
+    return stream_page('pages/venues.html', facets=facets, filters=filters,
+      areas=iter_areas(result.yield_per(500)))
+  else:
+    data = group_areas(db.session.execute(venue_area_statement(**filters)).all())
+
+  return render_template('pages/venues.html', areas=data, facets=facets, filters=filters)
+
+def venue_area_rows():
+  return db.session.execute(venue_area_statement()).all()
+
+def request_filters():
+  # ?genre=Jazz&genre=Blues lists rows with both, add match=any for either;
+  # ?state=CA&city=San+Francisco lists those in one area
+  genres = sorted(set(request.values.getlist('genre')))
+  state = request.values.get('state', '').strip().upper() or None
+  if not set(genres).issubset(Genre.__members__) or (state and state not in State.__members__):
+    abort(400)
+  return {
+    'genres': genres,
+    'match_any': request.values.get('match') == 'any',
+    'state': state,
+    'city': request.values.get('city', '').strip() or None,
+  }
+
+def facet_key(model, filters):
+  return 'facets:{}:{}:{}:{}:{}'.format(model.__tablename__, 'any' if filters['match_any'] else 'all',
+    ','.join(filters['genres']), filters['state'] or '', city_key(filters['city'] or ''))
+
+def cached_facets(model, filters):
+  key = facet_key(model, filters)
+  facets = facet_cache().get(key)
+  if facets is None:
+    facets = genre_facets(model, **filters)
+    facet_cache().set(key, facets)
+  return facets
+
+@pages.route('/venues/search', methods=['POST'])
+@budget(1)
+@db.read_only
+def search_venues():
+  # TODO: implement search on venues with partial string search. Ensure it is case-insensitive.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+  search_venue = request.form['search_term']
+  filters = request_filters()
+  count, searches = search(Venue, search_venue, current_app.config['SEARCH_LIMIT'], **filters)
+
+  response = {
+    "count": count,
+    "data": [{
+      "id": row.id,
+      "name": row.name,
+      "num_upcoming_shows": row.num_upcoming_shows
+    } for row in searches]
+  }
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''),
+    filters=filters, genre_choices=Genre.choices())
+
+@pages.route('/venues/<int:venue_id>')
+@budget(4)
+@db.read_only
+@cached(venue_key)
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  venue = profiled(Venue, 'detail').get_or_404(venue_id)
+
+  # both lists and their counts come from SQL, bounded by SHOWS_PAGE_SIZE
+  now = datetime.now()
+  limit = current_app.config['SHOWS_PAGE_SIZE']
+  upcoming_shows, upcoming_cursor = venue_shows(venue_id, True, limit, now)
+  past_shows, past_cursor = venue_shows(venue_id, False, limit, now)
+  past_count, upcoming_count = show_counts(Venue, venue_id, now)
+
+  # object class to dict
+  data = vars(venue)
+
+  data['past_shows'] = past_shows
+  data['upcoming_shows'] = upcoming_shows
+  data['past_shows_count'] = past_count
+  data['upcoming_shows_count'] = upcoming_count
+  data['past_shows_cursor'] = past_cursor
+  data['upcoming_shows_cursor'] = upcoming_cursor
+  return render_template('pages/show_venue.html', venue=data)
+
+@pages.route('/venues/<int:venue_id>/shows/<any(past, upcoming):when>')
+@budget(2)
+@db.read_only
+def more_venue_shows(venue_id, when):
+  # "load more" page continuing one of the show lists of a venue
+  venue = db.session.query(*load_profile(Venue, 'card').columns).filter(Venue.id == venue_id).first_or_404()
+  shows, cursor = venue_shows(venue_id, when == 'upcoming', current_app.config['SHOWS_PAGE_SIZE'],
+    datetime.now(), request_cursor())
+  return render_template('pages/more_shows.html', shows=shows, when=when, name=venue.name,
+    back_url=url_for('pages.show_venue', venue_id=venue_id),
+    next_url=cursor and url_for('pages.more_venue_shows', venue_id=venue_id, when=when, after=cursor))
+
+def request_cursor():
+  try:
+    return decode_cursor(request.args['after'])
+  except KeyError:
+    return None
+  except ValueError:
+    abort(400)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@pages.route('/venues/create', methods=['GET'])
+@budget(0)
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@pages.route('/venues/create', methods=['POST'])
+@budget(6)
+# TODO: insert form data as a new Venue record in the db, instead
+def create_venue_submission():
+  error = False
+  # form = VenueForm()
+  form = VenueForm(request.form)
+  
+  try:
+    venue = Venue(
+    name = form.name.data,
+    city = form.city.data,
+    state = form.state.data,
+    address = form.address.data,
+    phone = form.phone.data,
+    facebook_link = form.facebook_link.data,
+    image_link = form.image_link.data,
+    genres = form.genres.data,
+    website_link = form.website_link.data,
+    seeking_talent = form.seeking_talent.data,
+    seeking_description = form.seeking_description.data,
+    )
+    
+    # print(venue.name)
+    # # exit()
+    db.session.add(venue)
+    db.session.commit()  
+    area_index().put(venue.id, venue.name, venue.city, venue.state)
+    invalidate(venue_key(venue.id))
+  except:
+    db.session.rollback()
+    error=True
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  
+  # TODO: modify data to be the data object returned from db insertion
+    if error:
+      flash('An error occurred. Venue ' + request.form['name']+ ' could not be listed.')
+    else:
+      flash('Venue ' + request.form['name'] + ' was successfully listed!')
+
+  # on successful db insert, flash success
+  # flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  return render_template('pages/home.html')
+
+@pages.route('/venues/<venue_id>', methods=['DELETE'])
+@budget(10)
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  # name = None
+	# form = VenueForm()
+  # venue_id = request.form.get('venue_id')
+  venue_delete = profiled(Venue, 'delete').get_or_404(venue_id)
+  try:
+    deleted_id = venue_delete.id
+    affected_artists = venue_artist_ids(deleted_id)
+    db.session.delete(venue_delete)
+    db.session.commit()
+    area_index().remove(deleted_id)
+    invalidate(venue_key(deleted_id), *map(artist_key, affected_artists))
+    flash('Venue deleted successfully.')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occurred. Venue could not be deleted.')
+  
+  # venueshow = Venue.query.order_by(Venue.id)
+  # return redirect(url_for('show_venue', form=form, venue_id=venue_id))
+  return render_template('pages/home.html')
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  # return None
+
+#  Artists
+#  ----------------------------------------------------------------
+@pages.route('/artists')
+@budget(2)
+@db.read_only
+def artists():
+  # TODO: replace with real data returned from querying the database
+  
+  filters = request_filters()
+  facets = cached_facets(Artist, filters)
+  query = db.session.query(*load_profile(Artist, 'card').columns)\
+    .filter(genre_filter(Artist, filters['genres'], filters['match_any']),
+            location_filter(Artist, filters['state'], filters['city']))\
+    .order_by(Artist.id)
+  if current_app.config.get('STREAM_LISTINGS'):
+    return stream_page('pages/artists.html', artists=query.yield_per(500), facets=facets, filters=filters)
+  data = query.all()
+    
+      
+  return render_template('pages/artists.html', artists=data, facets=facets, filters=filters)
+
+@pages.route('/artists/search', methods=['POST'])
+@budget(1)
+@db.read_only
+def search_artists():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  search_artists = request.form['search_term']
+  filters = request_filters()
+  count, searches = search(Artist, search_artists, current_app.config['SEARCH_LIMIT'], **filters)
+
+  response = {
+    "count": count,
+    "data": [{
+      "id": row.id,
+      "name": row.name,
+      "num_upcoming_shows": row.num_upcoming_shows
+      }
+    for row in searches]
+  }
+  
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''),
+    filters=filters, genre_choices=Genre.choices())
+
+@pages.route('/artists/<int:artist_id>')
+@budget(4)
+@db.read_only
+@cached(artist_key)
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  artist = profiled(Artist, 'detail').get_or_404(artist_id)
+
+  now = datetime.now()
+  limit = current_app.config['SHOWS_PAGE_SIZE']
+  upcoming_shows, upcoming_cursor = artist_shows(artist_id, True, limit, now)
+  past_shows, past_cursor = artist_shows(artist_id, False, limit, now)
+  past_count, upcoming_count = show_counts(Artist, artist_id, now)
+
+  data = vars(artist)
+
+  data['past_shows'] = past_shows
+  data['upcoming_shows'] = upcoming_shows
+  data['past_shows_count'] = past_count
+  data['upcoming_shows_count'] = upcoming_count
+  data['past_shows_cursor'] = past_cursor
+  data['upcoming_shows_cursor'] = upcoming_cursor
+  return render_template('pages/show_artist.html', artist=data)
+
+@pages.route('/artists/<int:artist_id>/shows/<any(past, upcoming):when>')
+@budget(2)
+@db.read_only
+def more_artist_shows(artist_id, when):
+  # "load more" page continuing one of the show lists of an artist
+  artist = db.session.query(*load_profile(Artist, 'card').columns).filter(Artist.id == artist_id).first_or_404()
+  shows, cursor = artist_shows(artist_id, when == 'upcoming', current_app.config['SHOWS_PAGE_SIZE'],
+    datetime.now(), request_cursor())
+  return render_template('pages/more_shows.html', shows=shows, when=when, name=artist.name,
+    back_url=url_for('pages.show_artist', artist_id=artist_id),
+    next_url=cursor and url_for('pages.more_artist_shows', artist_id=artist_id, when=when, after=cursor))
+
+#  Update
+#  ----------------------------------------------------------------
+@pages.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@budget(1)
+@db.read_only
+def edit_artist(artist_id):
+  form = ArtistForm()
+
+  # TODO: populate form with fields from artist with ID <artist_id>
+  get_artist = profiled(Artist, 'form').get(artist_id)
+  data={
+    "id": get_artist.id,
+    "name": get_artist.name,
+    "genres": get_artist.genres,
+    "city": get_artist.city,
+    "state": get_artist.state,
+    "phone": get_artist.phone,
+    "website_link": get_artist.website_link,
+    "facebook_link": get_artist.facebook_link,
+    "seeking_venue": get_artist.seeking_venue,
+    "seeking_description": get_artist.seeking_description,
+    "image_link": get_artist.image_link
+  }
+  return render_template('forms/edit_artist.html', form=form, artist=data)
+
+@pages.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@budget(9)
+def edit_artist_submission(artist_id):
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  form = ArtistForm()
+  update_artist = profiled(Artist, 'form').get(artist_id)
+  
+  if request.method == 'POST':
+    update_artist.name  = request.form['name']
+    update_artist.genres = request.form.getlist('genres')
+    update_artist.city =  request.form['city']
+    update_artist.state = request.form['state']
+    update_artist.phone = request.form['phone']
+    update_artist.website_link = request.form['website_link']
+    update_artist.facebook_link = request.form['facebook_link']
+    update_artist.seeking_venue = request.form['seeking_venue']
+    update_artist.seeking_description = request.form['seeking_description']
+    update_artist.image_link = request.form['image_link']
+    try:
+      db.session.commit()
+      invalidate(artist_key(artist_id), *map(venue_key, artist_venue_ids(artist_id)))
+      flash('The Artist was updated successfully.')
+      return redirect(url_for('pages.show_artist', form=form, artist_id=artist_id))
+    except:
+      flash('An error occured when updating the Artist .')
+      return redirect(url_for('pages.show_artist', form=form, artist_id=artist_id))
+  else:
+      return redirect(url_for('pages.show_artist', form=form, artist_id=artist_id))
+    
+    
+
+  
+  
+    # return redirect(url_for('show_artist', artist_id=artist_id))
+
+@pages.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@budget(1)
+@db.read_only
+def edit_venue(venue_id):
+  form = VenueForm()
+
+  # TODO: populate form with values from venue with ID <venue_id>
+  get_venue = profiled(Venue, 'form').get(venue_id)
+  data={
+    "id": get_venue.id,
+    "name": get_venue.name,
+    "genres": get_venue.genres,
+    "address": get_venue.address,
+    "city": get_venue.city,
+    "state": get_venue.state,
+    "phone": get_venue.phone,
+    "website_link": get_venue.website_link,
+    "facebook_link": get_venue.facebook_link,
+    "seeking_talent": get_venue.seeking_talent,
+    "seeking_description": get_venue.seeking_description,
+    "image_link": get_venue.image_link
+  }
+  return render_template('forms/edit_venue.html', form=form, venue=data)
+
+@pages.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@budget(10)
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  form = VenueForm()
+  update_venue = profiled(Venue, 'form').get(venue_id)
+  
+  if request.method == 'POST':
+    update_venue.name  = request.form['name']
+    update_venue.genres = request.form.getlist('genres')
+    update_venue.address = request.form['address']
+    update_venue.city =  request.form['city']
+    update_venue.state = request.form['state']
+    update_venue.phone = request.form['phone']
+    update_venue.website_link = request.form['website_link']
+    update_venue.facebook_link = request.form['facebook_link']
+    update_venue.seeking_talent = request.form['seeking_talent']
+    update_venue.seeking_description = request.form['seeking_description']
+    update_venue.image_link = request.form['image_link']
+    # try:
+    db.session.commit()
+    area_index().put(update_venue.id, update_venue.name, update_venue.city, update_venue.state)
+    invalidate(venue_key(venue_id), *map(artist_key, venue_artist_ids(venue_id)))
+    flash('The Venue was updated successfully.')
+    return redirect(url_for('pages.show_venue', venue_id=venue_id))
+    # except:
+    flash('An error occured when updating the Venue. ')
+    return redirect(url_for('pages.show_venue', venue_id=venue_id))
+  else:
+      return redirect(url_for('pages.show_venue', venue_id=venue_id))
+  # return redirect(url_for('show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@pages.route('/artists/create', methods=['GET'])
+@budget(0)
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@pages.route('/artists/create', methods=['POST'])
+@budget(6)
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  error = False
+  form = ArtistForm(request.form)
+  try:
+    artist = Artist(
+    name = form.name.data,
+    city = form.city.data,
+    state = form.state.data,
+    phone = form.phone.data,
+    genres = form.genres.data,
+    image_link = form.image_link.data,
+    facebook_link = form.facebook_link.data,
+    website_link = form.website_link.data,
+    seeking_venue = form.seeking_venue.data,
+    seeking_description = form.seeking_description.data,
+    )
+  
+    db.session.add(artist)
+    db.session.commit()
+    invalidate(artist_key(artist.id))
+
+  except:
+    db.session.rollback()
+    error=True
+    print(sys.exc_info())
+  finally:
+    # db.session.close()
+    if error:
+      flash('An error occurred. Artist ' +  request.form['name'] + ' could not be listed.')
+    else:
+      flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  # TODO: modify data to be the data object returned from db insertion
+
+  # on successful db insert, flash success
+  # flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+  return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@pages.route('/shows')
+@budget(1)
+@db.read_only
+def shows():
+  # displays one keyset page of shows at /shows, upcoming only unless
+  # ?past=1 or a ?from= date is given
+  start = request_date('from')
+  end = request_date('to')
+  if end:
+    end += timedelta(days=1)
+  include_past = request.args.get('past') == '1'
+  if start is None and not include_past:
+    start = datetime.now()
+
+  filters = {k: v for k, v in request.args.items() if k in ('from', 'to', 'past') and v}
+  if current_app.config.get('STREAM_LISTINGS'):
+    # the whole range in one streamed response instead of pages
+    return stream_page('pages/shows.html', shows=iter_show_listing(start, end),
+      filters=filters, next_url=None)
+
+  data, cursor = show_listing(current_app.config['SHOWS_PAGE_SIZE'], start, end, request_cursor())
+
+  next_url = cursor and url_for('pages.shows', after=cursor, **filters)
+  return render_template('pages/shows.html', shows=data, filters=filters, next_url=next_url)
+
+def request_date(name):
+  value = request.args.get(name)
+  if not value:
+    return None
+  try:
+    return datetime.strptime(value, '%Y-%m-%d')
+  except ValueError:
+    abort(400)
+
+@pages.route('/shows/create')
+@budget(0)
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+# messages for the exclusion constraints a booking can run into, by the end of
+# their name: each show partition has its own pair (see partitions.py)
+SLOT_TAKEN = {
+  'venue_slot': 'The venue already has a show booked at that time.',
+  'artist_slot': 'The artist already has a show booked at that time.',
+}
+
+def slot_taken(constraint_name):
+  for suffix, message in SLOT_TAKEN.items():
+    if constraint_name and constraint_name.endswith(suffix):
+      return message
+  return None
+
+@pages.route('/shows/create', methods=['POST'])
+@budget(7)
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  error = None
+  form = ShowForm(request.form)
+  try:
+    show = Show(
+      artist_id = form.artist_id.data,
+      venue_id = form.venue_id.data,
+      start_time = form.start_time.data,
+      end_time = form.start_time.data + timedelta(minutes=form.duration.data),
+    )
+  
+    db.session.add(show)
+    db.session.commit()
+    invalidate(venue_key(show.venue_id), artist_key(show.artist_id))
+
+  except IntegrityError as e:
+    db.session.rollback()
+    error = slot_taken(getattr(e.orig.diag, 'constraint_name', None)) or 'Error in listing a new show'
+  except:
+    db.session.rollback()
+    error='Error in listing a new show'
+    print(sys.exc_info())
+  finally:
+    # db.session.close()
+    if error:
+      flash(error)
+    else:
+      flash('A new show has been listed successfully')
+  # on successful db insert, flash success
+  # flash('Show was successfully listed!')
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Show could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  return render_template('pages/home.html')
+
+@pages.route('/export/<any(venue, artist, show):kind>.<any(csv, ndjson):format>')
+@budget(2)
+@db.read_only
+def export(kind, format):
+  # streams a table dump; needs 'Authorization: Bearer <EXPORT_TOKEN>'
+  token = current_app.config.get('EXPORT_TOKEN')
+  supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+  if not token:
+    abort(404)
+  if not hmac.compare_digest(supplied, token):
+    abort(401)
+  since = None
+  if request.args.get('since'):
+    try:
+      since = datetime.fromisoformat(request.args['since'])
+    except ValueError:
+      abort(400)
+  from exporter import iter_csv, iter_ndjson, watermark
+  until = watermark(kind, since)
+  chunks = (iter_csv if format == 'csv' else iter_ndjson)(kind, since, until)
+  mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+  response = Response(stream_with_context(chunks), mimetype=mimetype)
+  if until is not None:
+    response.headers['X-Export-Watermark'] = until.isoformat()
+  return response
+
+@pages.route('/cache/stats')
+@budget(0)
+def cache_stats():
+  return jsonify(page_cache().stats())
+
+@pages.route('/pool/stats')
+@budget(0)
+def pool_stats():
+  return jsonify(engine_pool_stats(db.engine))
+
+@pages.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@pages.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
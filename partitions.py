@@ -0,0 +1,63 @@
+import re
+from datetime import datetime
+from models import db
+#----------------------------------------------------------------------------#
+# Show partitions.
+#----------------------------------------------------------------------------#
+
+# show is range-partitioned by month of start_time into show_pYYYY_MM tables,
+# plus show_default for anything no monthly partition covers. The
+# show_partition() database function creates one month's partition with its
+# exclusion constraints; see the show partitioning migration.
+PARTITION_NAME = re.compile(r'^show_p(\d{4})_(\d{2})$')
+
+def month_start(value):
+  return datetime(value.year, value.month, 1)
+
+def add_months(month, count):
+  years, month_index = divmod(month.month - 1 + count, 12)
+  return datetime(month.year + years, month_index + 1, 1)
+
+def create_partitions(connection, months_ahead=12, now=None):
+  """Make sure this month and the months_ahead after it have a partition; returns their names."""
+  first = month_start(now or datetime.now())
+  return [connection.execute(db.select(db.func.show_partition(add_months(first, count)))).scalar()
+          for count in range(months_ahead + 1)]
+
+def partitions(connection):
+  """(name, month) of the monthly partitions attached to show, oldest first."""
+  names = connection.execute(db.text(
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = 'show'::regclass")).scalars()
+  months = []
+  for name in names:
+    match = PARTITION_NAME.match(name)
+    if match:
+      months.append((name, datetime(int(match[1]), int(match[2]), 1)))
+  return sorted(months, key=lambda partition: partition[1])
+
+def archive_partitions(connection, before, move=False):
+  """Take the partitions of the months before the month of before out of show.
+
+  Detached partitions are left as plain tables under their own names; with
+  move, their rows are appended to show_archive and the tables dropped.
+  Either way archived shows no longer tie their venue or artist down: the
+  detached tables lose the foreign keys they had from show, as
+  show_archive has none, so deleting a venue or artist is not blocked by
+  shows the app no longer sees. Returns the names of the partitions archived.
+  """
+  archived = []
+  for name, month in partitions(connection):
+    if month >= month_start(before):
+      break
+    connection.execute(db.text(f'ALTER TABLE show DETACH PARTITION "{name}"'))
+    foreign_keys = connection.execute(db.text(
+      "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:name AS regclass) AND contype = 'f'"),
+      {'name': name}).scalars().all()
+    for constraint in foreign_keys:
+      connection.execute(db.text(f'ALTER TABLE "{name}" DROP CONSTRAINT "{constraint}"'))
+    if move:
+      connection.execute(db.text(f'INSERT INTO show_archive SELECT * FROM "{name}"'))
+      connection.execute(db.text(f'DROP TABLE "{name}"'))
+    archived.append(name)
+  return archived
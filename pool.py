@@ -0,0 +1,82 @@
+import time
+from threading import Lock
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool, NullPool
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+class MeteredQueuePool(QueuePool):
+  """QueuePool that keeps count of checkouts and of the time spent waiting for them."""
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self._metrics_lock = Lock()
+    self.checkouts = 0
+    self.timeouts = 0
+    self.wait_seconds = 0.0
+    self.max_wait_seconds = 0.0
+
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      return super()._do_get()
+    except TimeoutError:
+      with self._metrics_lock:
+        self.timeouts += 1
+      raise
+    finally:
+      waited = time.perf_counter() - started
+      with self._metrics_lock:
+        self.checkouts += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+  def stats(self):
+    return {
+      'size': self.size(),
+      'checked_out': self.checkedout(),
+      'idle': self.checkedin(),
+      'overflow': max(self.overflow(), 0),
+      'checkouts': self.checkouts,
+      'timeouts': self.timeouts,
+      'wait_seconds_total': round(self.wait_seconds, 6),
+      'wait_seconds_max': round(self.max_wait_seconds, 6),
+    }
+
+
+def engine_options(environ):
+  """SQLALCHEMY_ENGINE_OPTIONS from DB_* environment variables.
+
+  DB_PGBOUNCER=1 is for a PgBouncer in transaction pooling mode: PgBouncer
+  does the pooling, so connections are not kept here, and no session state
+  survives a transaction -- the statement timeout is set per transaction.
+  """
+  statement_timeout = int(environ.get('DB_STATEMENT_TIMEOUT_MS', '30000'))
+  if environ.get('DB_PGBOUNCER') == '1':
+    return {'poolclass': NullPool}
+  return {
+    'poolclass': MeteredQueuePool,
+    'pool_size': int(environ.get('DB_POOL_SIZE', '5')),
+    'max_overflow': int(environ.get('DB_MAX_OVERFLOW', '10')),
+    'pool_timeout': float(environ.get('DB_POOL_TIMEOUT', '30')),
+    'pool_recycle': int(environ.get('DB_POOL_RECYCLE', '1800')),
+    'pool_pre_ping': environ.get('DB_POOL_PRE_PING', '1') == '1',
+    'connect_args': {'options': f'-c statement_timeout={statement_timeout}'},
+  }
+
+def init_engine(engine, app):
+  """Engine setup that options alone cannot express."""
+  if not app.config.get('DB_PGBOUNCER'):
+    return
+  timeout = int(app.config['DB_STATEMENT_TIMEOUT_MS'])
+
+  @event.listens_for(engine, 'begin')
+  def set_statement_timeout(connection):
+    connection.execution_options(uncounted=True).exec_driver_sql(f'SET LOCAL statement_timeout = {timeout}')
+
+def pool_stats(engine):
+  if isinstance(engine.pool, MeteredQueuePool):
+    return engine.pool.stats()
+  return {'pool': type(engine.pool).__name__}
@@ -0,0 +1,194 @@
+import json
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+from threading import Lock
+from flask import Blueprint, abort, current_app, g, has_app_context, render_template, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+#----------------------------------------------------------------------------#
+# Request profiling.
+#----------------------------------------------------------------------------#
+
+# One JSON line per request, when PROFILE_REQUESTS is on.
+logger = logging.getLogger('fyyur.profile')
+
+class Profile:
+  """What one request spent its time on."""
+
+  def __init__(self, id, method, path):
+    self.id = id
+    self.method = method
+    self.path = path
+    self.started = time.perf_counter()
+    self.started_at = time.time()
+    self.status = None
+    self.total = 0.0
+    self.timings = {'db': 0.0, 'render': 0.0, 'serialize': 0.0}
+    # (statement, seconds), in the order they ran
+    self.statements = []
+
+  def add(self, name, seconds):
+    self.timings[name] += seconds
+
+  def finish(self, status):
+    self.status = status
+    self.total = time.perf_counter() - self.started
+
+  def server_timing(self):
+    """Value of the Server-Timing header: durations in milliseconds."""
+    return ', '.join([
+      f'db;dur={self.timings["db"] * 1000:.1f};desc="{len(self.statements)} queries"',
+      f'render;dur={self.timings["render"] * 1000:.1f}',
+      f'serialize;dur={self.timings["serialize"] * 1000:.1f}',
+      f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}',
+    ])
+
+  def record(self):
+    return {
+      'id': self.id,
+      'method': self.method,
+      'path': self.path,
+      'status': self.status,
+      'queries': len(self.statements),
+      'total_ms': round(self.total * 1000, 3),
+      **{f'{name}_ms': round(seconds * 1000, 3) for name, seconds in self.timings.items()},
+    }
+
+
+def current_profile():
+  """The Profile of the request being served, or None when not profiling."""
+  return g.get('profile') if has_app_context() else None
+
+@contextmanager
+def timed(name):
+  """Add the time spent in the block to the current request's name timing."""
+  profile = current_profile()
+  if profile is None:
+    yield
+    return
+  started = time.perf_counter()
+  try:
+    yield
+  finally:
+    profile.add(name, time.perf_counter() - started)
+
+
+class ProfiledTemplate(Template):
+  """Template whose rendering counts as render time of the current request.
+
+  Queries run from inside the template, such as lazy loads, are counted in
+  both render and db time.
+  """
+
+  def render(self, *args, **kwargs):
+    with timed('render'):
+      return super().render(*args, **kwargs)
+
+  def generate(self, *args, **kwargs):
+    # only the time spent producing each chunk, not the time the server
+    # takes to send it
+    chunks = super().generate(*args, **kwargs)
+    while True:
+      with timed('render'):
+        chunk = next(chunks, None)
+      if chunk is None:
+        return
+      yield chunk
+
+
+def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+  if current_profile() is not None:
+    connection.info.setdefault('profile_started', []).append(time.perf_counter())
+
+def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+  profile = current_profile()
+  started = connection.info.get('profile_started')
+  if profile is not None and started:
+    seconds = time.perf_counter() - started.pop()
+    profile.add('db', seconds)
+    profile.statements.append((statement, seconds))
+
+def listen_engines():
+  # on the Engine class, so the replica engines are profiled as well
+  if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+
+class RequestProfiler:
+  """Times the SQL, template rendering and serialization of every request.
+
+  Off unless PROFILE_REQUESTS is set. Each response gets a Server-Timing
+  header, each request a line on the fyyur.profile logger, and the last
+  PROFILE_HISTORY requests are listed with their statements at
+  /debug/requests. A streamed response has its header sent before its body
+  is generated, so only the log and the listing have its full numbers.
+  """
+
+  def __init__(self, app):
+    self.history = deque(maxlen=app.config.get('PROFILE_HISTORY', 100))
+    self._lock = Lock()
+    self._ids = count(1)
+    if not app.config.get('PROFILE_REQUESTS'):
+      return
+    listen_engines()
+    app.jinja_env.template_class = ProfiledTemplate
+    app.before_request(self.start)
+    app.after_request(self.finish)
+    app.extensions['profiler'] = self
+    app.register_blueprint(debug)
+
+  def start(self):
+    if request.blueprint != debug.name:
+      g.profile = Profile(next(self._ids), request.method, request.full_path.rstrip('?'))
+
+  def finish(self, response):
+    # left on g, so that a streamed body is profiled as it is generated
+    profile = g.get('profile')
+    if profile is None:
+      return response
+    response.headers['Server-Timing'] = profile.server_timing()
+    def close():
+      profile.finish(response.status_code)
+      logger.info(json.dumps(profile.record()))
+      with self._lock:
+        self.history.appendleft(profile)
+    response.call_on_close(close)
+    return response
+
+  def find(self, id):
+    with self._lock:
+      return next((profile for profile in self.history if profile.id == id), None)
+
+  def recent(self):
+    with self._lock:
+      return list(self.history)
+
+#----------------------------------------------------------------------------#
+# Debug pages.
+#----------------------------------------------------------------------------#
+
+debug = Blueprint('debug', __name__, url_prefix='/debug')
+
+@debug.before_request
+def debug_only():
+  # statements can give away more than the pages do
+  if not current_app.debug:
+    abort(404)
+
+@debug.route('/requests')
+def requests():
+  profiler = current_app.extensions['profiler']
+  return render_template('pages/profile.html', profiles=profiler.recent(), profile=None)
+
+@debug.route('/requests/<int:id>')
+def request_detail(id):
+  profile = current_app.extensions['profiler'].find(id)
+  if profile is None:
+    abort(404)
+  statements = sorted(profile.statements, key=lambda statement: statement[1], reverse=True)
+  return render_template('pages/profile.html', profiles=None, profile=profile, statements=statements)
@@ -0,0 +1,284 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, or_, tuple_
+from enums import Genre
+from models import Venue, Artist, Show, VenueStats, ArtistStats, Location, city_key, db
+#----------------------------------------------------------------------------#
+# Show queries.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(start_time, id):
+  return f'{start_time.isoformat()}_{id}'
+
+def decode_cursor(cursor):
+  """Turn a cursor from encode_cursor() back into (start_time, id); raises ValueError."""
+  start_time, _, id = cursor.rpartition('_')
+  return datetime.fromisoformat(start_time), int(id)
+
+# Each query comes as a statement builder and a function running it on
+# db.session, so that the ASGI app (asgi.py) can run the same statements on
+# its async engine.
+
+STATS = {Venue: (VenueStats, VenueStats.venue_id, Show.venue_id),
+         Artist: (ArtistStats, ArtistStats.artist_id, Show.artist_id)}
+
+def stats_counts(model, now):
+  """(past, upcoming) count expressions over the stats table of model.
+
+  They read the stats row, unless a show of it started after it was counted:
+  then they count that venue's or artist's shows (see stats.py).
+  """
+  stats, key, show_key = STATS[model]
+  fresh = or_(stats.next_show_time.is_(None), stats.next_show_time > now)
+  def counted(condition):
+    return db.select(func.count(Show.id)).where(show_key == key, condition).scalar_subquery()
+  return (
+    case((fresh, stats.past_shows_count), else_=counted(Show.start_time <= now)),
+    case((fresh, stats.upcoming_shows_count), else_=counted(Show.start_time > now)),
+  )
+
+def show_counts_statement(model, id, now):
+  """Past and upcoming show counts of one venue or artist, from its stats row."""
+  stats, key, _ = STATS[model]
+  return db.select(*stats_counts(model, now)).where(key == id)
+
+def show_counts(model, id, now):
+  row = db.session.execute(show_counts_statement(model, id, now)).first()
+  return tuple(row) if row else (0, 0)
+
+def venue_artist_ids(venue_id):
+  """Ids of the artists with a show at the venue."""
+  return [id for id, in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+def artist_venue_ids(artist_id):
+  """Ids of the venues with a show by the artist."""
+  return [id for id, in db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+
+def keyset_statement(statement, limit, cursor=None, descending=False):
+  """Order a Show statement on (start_time, id) and select the page after cursor.
+
+  One row more than limit is selected; keyset_result() uses it to tell
+  whether there is a next page.
+  """
+  key = tuple_(Show.start_time, Show.id)
+  if descending:
+    if cursor:
+      statement = statement.where(key < cursor)
+    statement = statement.order_by(Show.start_time.desc(), Show.id.desc())
+  else:
+    if cursor:
+      statement = statement.where(key > cursor)
+    statement = statement.order_by(Show.start_time, Show.id)
+  return statement.limit(limit + 1)
+
+def keyset_result(rows, limit):
+  """The rows of this page and the cursor of the next one, or None on the last page."""
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+  return rows, next_cursor
+
+def keyset_page(statement, limit, cursor=None, descending=False):
+  rows = db.session.execute(keyset_statement(statement, limit, cursor, descending)).all()
+  return keyset_result(rows, limit)
+
+def show_page_statement(statement, upcoming, limit, now, cursor=None):
+  """Apply the past/upcoming split to a Show statement and select one keyset page of it.
+
+  Upcoming shows come soonest first and past shows most recent first.
+  """
+  if upcoming:
+    return keyset_statement(statement.where(Show.start_time > now), limit, cursor)
+  return keyset_statement(statement.where(Show.start_time <= now), limit, cursor, descending=True)
+
+def venue_shows_statement(venue_id, upcoming, limit, now, cursor=None):
+  statement = db.select(
+    Show.id, Show.start_time, Show.artist_id, Artist.name, Artist.image_link
+  ).join(Artist, Show.artist_id == Artist.id).where(Show.venue_id == venue_id)
+  return show_page_statement(statement, upcoming, limit, now, cursor)
+
+def venue_show_items(rows, limit):
+  rows, next_cursor = keyset_result(rows, limit)
+  return [{
+    'artist_id': row.artist_id,
+    'artist_name': row.name,
+    'artist_image_link': row.image_link,
+    'start_time': row.start_time.strftime("%m/%d/%Y, %H:%M")
+  } for row in rows], next_cursor
+
+def venue_shows(venue_id, upcoming, limit, now, cursor=None):
+  statement = venue_shows_statement(venue_id, upcoming, limit, now, cursor)
+  return venue_show_items(db.session.execute(statement).all(), limit)
+
+def artist_shows_statement(artist_id, upcoming, limit, now, cursor=None):
+  statement = db.select(
+    Show.id, Show.start_time, Show.venue_id, Venue.name, Venue.image_link
+  ).join(Venue, Show.venue_id == Venue.id).where(Show.artist_id == artist_id)
+  return show_page_statement(statement, upcoming, limit, now, cursor)
+
+def artist_show_items(rows, limit):
+  rows, next_cursor = keyset_result(rows, limit)
+  return [{
+    'venue_id': row.venue_id,
+    'venue_name': row.name,
+    'venue_image_link': row.image_link,
+    'start_time': row.start_time.strftime("%m/%d/%Y, %H:%M")
+  } for row in rows], next_cursor
+
+def artist_shows(artist_id, upcoming, limit, now, cursor=None):
+  statement = artist_shows_statement(artist_id, upcoming, limit, now, cursor)
+  return artist_show_items(db.session.execute(statement).all(), limit)
+
+def show_listing_statement(start=None, end=None):
+  statement = db.select(
+    Show.id, Show.start_time, Show.end_time, Show.venue_id, Venue.name.label('venue_name'),
+    Show.artist_id, Artist.name.label('artist_name'), Artist.image_link
+  ).join(Artist, Show.artist_id == Artist.id).join(Venue, Show.venue_id == Venue.id)
+  if start:
+    statement = statement.where(Show.start_time >= start)
+  if end:
+    statement = statement.where(Show.start_time < end)
+  return statement
+
+def show_listing_item(row):
+  return {
+    "venue_id": row.venue_id,
+    "venue_name": row.venue_name,
+    "artist_id": row.artist_id,
+    "artist_name": row.artist_name,
+    "artist_image_link": row.image_link,
+    "start_time": row.start_time.strftime('%Y-%m-%d %H:%M:%S')
+  }
+
+def show_listing(limit, start=None, end=None, cursor=None):
+  """One page of the /shows listing, optionally limited to start <= start_time < end."""
+  rows, next_cursor = keyset_page(show_listing_statement(start, end), limit, cursor)
+  return [show_listing_item(row) for row in rows], next_cursor
+
+def iter_show_listing(start=None, end=None, batch=500):
+  """Every show in the range, read through a server-side cursor batch rows at a time."""
+  statement = show_listing_statement(start, end).order_by(Show.start_time, Show.id)
+  result = db.session.execute(statement, execution_options={'stream_results': True})
+  return (show_listing_item(row) for row in result.yield_per(batch))
+
+def slot_overlaps(start, end):
+  """Shows whose [start_time, end_time) slot overlaps [start, end)."""
+  return func.tsrange(Show.start_time, Show.end_time).op('&&')(func.tsrange(start, end))
+
+def slot_conflicts_statement(start, end, venue_id=None, artist_id=None):
+  """Shows of the venue or of the artist that a booking of [start, end) would overlap.
+
+  Matches the expressions of the slot exclusion constraints of each show
+  partition, so each side is one lookup per partition in their GiST indexes.
+  As ck_show_slot_length caps a slot at one day, an overlapping show starts
+  less than a day before start, which lets the planner skip every partition
+  but the one or two around the booking, as the partition trigger does.
+  """
+  owners = []
+  if venue_id is not None:
+    owners.append(Show.venue_id == venue_id)
+  if artist_id is not None:
+    owners.append(Show.artist_id == artist_id)
+  return db.select(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)\
+    .where(or_(*owners), slot_overlaps(start, end),
+           Show.start_time > start - timedelta(days=1), Show.start_time < end)\
+    .order_by(Show.start_time, Show.id)
+
+def slot_conflicts(start, end, venue_id=None, artist_id=None):
+  if venue_id is None and artist_id is None:
+    return []
+  return db.session.execute(slot_conflicts_statement(start, end, venue_id, artist_id)).all()
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_document(model):
+  """The text searched for a venue or artist; matches the expression of its trigram index."""
+  return model.name + ' ' + model.city + ' ' + model.state
+
+def escape_like(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_statement(model, term, limit, now=None, genres=(), match_any=False, state=None, city=None):
+  """Case-insensitive partial match of term against name, city and state.
+
+  Served by the pg_trgm GIN index on search_document(). Hits are ranked by
+  word similarity to the term and at most limit of them are selected, each
+  with its num_upcoming_shows, along with the total number of matches -- all
+  in a single statement. The other arguments narrow the hits as in
+  genre_filter() and location_filter().
+  """
+  document = search_document(model)
+  stats, key, _ = STATS[model]
+  _, upcoming = stats_counts(model, now or datetime.now())
+  return db.select(
+    model.id, model.name,
+    func.coalesce(upcoming, 0).label('num_upcoming_shows'),
+    func.count().over().label('total')
+  ).outerjoin(stats, key == model.id)\
+    .where(document.ilike(f'%{escape_like(term)}%', escape='\\'),
+           genre_filter(model, genres, match_any), location_filter(model, state, city))\
+    .order_by(func.word_similarity(term, document).desc(), model.name, model.id)\
+    .limit(limit)
+
+def search(model, term, limit, now=None, **filters):
+  """Returns (total, rows) for search_statement()."""
+  rows = db.session.execute(search_statement(model, term, limit, now, **filters)).all()
+  return (rows[0].total if rows else 0), rows
+
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+def genre_filter(model, genres, match_any=False):
+  """Rows having all of genres (@>), or any of them (&&); served by the GIN index on genres.
+
+  The genres are cast to the column's type: compared with text[], the
+  varchar[] column would be cast instead and the index left unused.
+  """
+  if not genres:
+    return db.true()
+  genres = db.cast(list(genres), model.genres.type)
+  return model.genres.op('&&' if match_any else '@>')(genres)
+
+def genre_facets_statement(model, genres=(), match_any=False, state=None, city=None):
+  """Number of rows per genre among those the filters select, in one grouped unnest."""
+  genre = db.select(func.unnest(model.genres).label('genre'))\
+    .where(genre_filter(model, genres, match_any), location_filter(model, state, city)).subquery()
+  return db.select(genre.c.genre, func.count()).group_by(genre.c.genre)
+
+def genre_facet_items(rows):
+  """One facet per enums.Genre, in its order, with the counts of rows."""
+  counts = dict(rows)
+  return [{'name': genre.name, 'label': genre.value, 'count': counts.get(genre.name, 0)}
+          for genre in Genre]
+
+def genre_facets(model, genres=(), match_any=False, state=None, city=None):
+  statement = genre_facets_statement(model, genres, match_any, state, city)
+  return genre_facet_items(db.session.execute(statement).all())
+
+#----------------------------------------------------------------------------#
+# Locations.
+#----------------------------------------------------------------------------#
+
+def location_filter(model, state=None, city=None):
+  """Rows in state and city, either optional; city is matched however it is spelled."""
+  if not state and not city:
+    return db.true()
+  locations = db.select(Location.id)
+  if state:
+    locations = locations.where(Location.state == state)
+  if city:
+    locations = locations.where(Location.city_key == city_key(city))
+  return model.location_id.in_(locations)
+
+def venue_area_statement(genres=(), match_any=False, state=None, city=None):
+  """Venues ordered by area, walking the (state, city) index of location.
+
+  Each area's venues then come from the (location_id, id) index of venue.
+  """
+  return db.select(Location.city, Location.state, Venue.id, Venue.name)\
+    .join(Location, Venue.location_id == Location.id)\
+    .where(genre_filter(Venue, genres, match_any), location_filter(Venue, state, city))\
+    .order_by(Location.state, Location.city, Location.id, Venue.id)
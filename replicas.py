@@ -0,0 +1,157 @@
+import time
+from itertools import cycle
+from threading import Lock
+from flask import current_app, g, has_app_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from psycopg2.errors import QueryCanceled
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.exc import OperationalError
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+class ReplicaSet:
+  """Round-robin over replica engines, skipping the ones found to be down.
+
+  A replica is checked with a SELECT 1 at most every check_seconds; one that
+  fails the check or drops a connection is left out for down_seconds.
+  """
+
+  def __init__(self, uris, engine_options=None, check_seconds=5, down_seconds=30):
+    self.engines = [create_engine(uri, **(engine_options or {})) for uri in uris]
+    self.check_seconds = check_seconds
+    self.down_seconds = down_seconds
+    self._lock = Lock()
+    self._order = cycle(range(len(self.engines)))
+    self._checked = [0.0] * len(self.engines)
+    self._down_until = [0.0] * len(self.engines)
+    for index, engine in enumerate(self.engines):
+      event.listen(engine, 'handle_error', self._on_error(index))
+
+  def _on_error(self, index):
+    def handle_error(context):
+      if context.is_disconnect:
+        self.mark_down(index)
+    return handle_error
+
+  def mark_engine_down(self, engine):
+    self.mark_down(self.engines.index(engine))
+
+  def mark_down(self, index):
+    with self._lock:
+      self._down_until[index] = time.monotonic() + self.down_seconds
+
+  def healthy(self, index):
+    now = time.monotonic()
+    with self._lock:
+      if self._down_until[index] > now:
+        return False
+      if now - self._checked[index] < self.check_seconds:
+        return True
+      self._checked[index] = now
+    try:
+      # runs inside whichever request comes due; not one of its queries
+      with self.engines[index].connect() as connection:
+        connection.execution_options(uncounted=True).exec_driver_sql('SELECT 1')
+      return True
+    except Exception:
+      self.mark_down(index)
+      return False
+
+  def choose(self):
+    """A healthy replica engine, or None to fall back to the primary."""
+    for _ in range(len(self.engines)):
+      with self._lock:
+        index = next(self._order)
+      if self.healthy(index):
+        return self.engines[index]
+    return None
+
+
+def wrote_recently():
+  """Whether this client wrote within REPLICA_STICKY_SECONDS, and so reads from the primary."""
+  sticky = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+  return time.time() - session.get('last_write', 0) <= sticky
+
+def served_from_replica():
+  """Whether this request has read from a replica."""
+  return has_app_context() and g.get('replica_engine') is not None
+
+
+class RoutingSession(SignallingSession):
+  """Session that reads from a replica during requests marked for it.
+
+  Flushes, and anything outside such a request, go to the primary, and so
+  does the rest of a request whose replica fails under it.
+  """
+
+  def __init__(self, db, **options):
+    self.db = db
+    super().__init__(db, **options)
+
+  def execute(self, *args, **kwargs):
+    try:
+      return super().execute(*args, **kwargs)
+    except OperationalError as error:
+      engine = g.get('replica_engine') if has_app_context() else None
+      # a statement timeout would only time out again on the primary
+      if engine is None or isinstance(error.orig, QueryCanceled):
+        raise
+      # the replica went away since its last check: leave it out and read
+      # this request's data from the primary instead of failing it
+      self.db.replicas.mark_engine_down(engine)
+      g.replica_engine = None
+      g.use_replica = False
+      self.rollback()
+      return super().execute(*args, **kwargs)
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    if bind is not None:
+      return bind
+    if not self._flushing and has_app_context() and g.get('use_replica') and self.db.replicas:
+      engine = g.get('replica_engine')
+      if engine is None:
+        engine = g.replica_engine = self.db.replicas.choose()
+      if engine is not None:
+        return engine
+      g.use_replica = False
+    return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  """SQLAlchemy extension that can route read-only views to replicas.
+
+  Views opt in with @db.read_only. A client that wrote within the last
+  REPLICA_STICKY_SECONDS reads from the primary, so it sees its own writes.
+  """
+
+  def __init__(self, *args, **kwargs):
+    self.replicas = None
+    super().__init__(*args, **kwargs)
+
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+  def init_app(self, app):
+    super().init_app(app)
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS')
+    if uris:
+      self.replicas = ReplicaSet(uris, app.config.get('SQLALCHEMY_ENGINE_OPTIONS'))
+
+    @app.before_request
+    def route_reads():
+      view = app.view_functions.get(request.endpoint)
+      g.use_replica = getattr(view, 'read_only', False) and not wrote_recently()
+
+    @app.after_request
+    def remember_write(response):
+      view = app.view_functions.get(request.endpoint)
+      if request.method not in ('GET', 'HEAD', 'OPTIONS') and not getattr(view, 'read_only', False):
+        session['last_write'] = time.time()
+      return response
+
+  @staticmethod
+  def read_only(view):
+    """Mark a view as safe to serve from a replica."""
+    view.read_only = True
+    return view
@@ -0,0 +1,169 @@
+import csv
+import io
+import random
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+from models import Venue, Artist, db, locate
+import partitions
+import stats
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+# (venues, artists, shows) per scale
+SCALES = {
+  '1k': (100, 200, 1000),
+  '100k': (2000, 5000, 100000),
+  '10m': (50000, 200000, 10000000),
+}
+
+# Venues and artists are spread over states by population (2020 census, in
+# hundred thousands), and within a state over its cities on a Zipf curve.
+STATE_WEIGHTS = {
+  'AL': 50, 'AK': 7, 'AZ': 72, 'AR': 30, 'CA': 395, 'CO': 58, 'CT': 36, 'DE': 10, 'DC': 7,
+  'FL': 215, 'GA': 107, 'HI': 15, 'ID': 18, 'IL': 128, 'IN': 68, 'IA': 32, 'KS': 29, 'KY': 45,
+  'LA': 47, 'ME': 14, 'MT': 11, 'NE': 20, 'NV': 31, 'NH': 14, 'NJ': 93, 'NM': 21, 'NY': 202,
+  'NC': 104, 'ND': 8, 'OH': 118, 'OK': 40, 'OR': 42, 'MD': 62, 'MA': 70, 'MI': 101, 'MN': 57,
+  'MS': 30, 'MO': 62, 'PA': 130, 'RI': 11, 'SC': 51, 'SD': 9, 'TN': 69, 'TX': 291, 'UT': 33,
+  'VT': 6, 'VA': 86, 'WA': 77, 'WV': 18, 'WI': 59, 'WY': 6,
+}
+CITIES = ('Springfield', 'Franklin', 'Greenville', 'Clinton', 'Fairview', 'Madison',
+          'Salem', 'Georgetown', 'Arlington', 'Ashland', 'Riverside', 'Bristol')
+
+# Share of venues and artists listing each genre as their first one.
+GENRE_WEIGHTS = {
+  'Alternative': 6, 'Blues': 4, 'Classical': 2, 'Country': 8, 'Electronic': 7, 'Folk': 4,
+  'Funk': 3, 'Hip_Hop': 12, 'Heavy_Metal': 4, 'Instrumental': 2, 'Jazz': 6,
+  'Musical_Theatre': 1, 'Pop': 14, 'Punk': 3, 'R_B': 8, 'Reggae': 2, 'Rock_n_Roll': 11,
+  'Soul': 3, 'Other': 2,
+}
+
+# Shows start at one of these hours and last at most three hours, so no two
+# shows given different slots can overlap.
+START_HOURS = (12, 15, 18, 21)
+DURATIONS = (60, 90, 120, 150, 180)
+
+
+class Weighted:
+  """Seeded weighted choice over a fixed population."""
+
+  def __init__(self, rng, population, weights):
+    self.rng = rng
+    self.population = list(population)
+    self.cumulative = list(accumulate(weights))
+
+  def __call__(self):
+    return self.population[bisect(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+  def distinct(self, count):
+    """count different members, the heavier ones more often."""
+    if count * 2 > len(self.population):
+      return self.rng.sample(self.population, count)
+    chosen = set()
+    while len(chosen) < count:
+      chosen.add(self())
+    return list(chosen)
+
+
+def zipf(count):
+  return [1 / rank for rank in range(1, count + 1)]
+
+def copy_rows(connection, table, columns, rows, batch=100000):
+  """COPY rows into table batch rows at a time."""
+  cursor = connection.connection.cursor()
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  def flush():
+    buffer.seek(0)
+    cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH CSV', buffer)
+    buffer.seek(0)
+    buffer.truncate()
+  for count, row in enumerate(rows, start=1):
+    writer.writerow(row)
+    if count % batch == 0:
+      flush()
+  flush()
+
+def array(values):
+  return '{' + ','.join(values) + '}'
+
+def next_id(connection, model):
+  return connection.execute(db.select(db.func.coalesce(db.func.max(model.id), 0) + 1)).scalar()
+
+def generate(connection, venues, artists, shows, seed=0, now=None):
+  """Add venues, artists and shows made up from seed; the same seed gives the same rows.
+
+  Shows are spread from two years before now to one year after it. Returns
+  (venues, artists, shows) added; the caller commits.
+  """
+  rng = random.Random(seed)
+  now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+  state = Weighted(rng, STATE_WEIGHTS, STATE_WEIGHTS.values())
+  city = Weighted(rng, range(len(CITIES)), zipf(len(CITIES)))
+  genre = Weighted(rng, GENRE_WEIGHTS, GENRE_WEIGHTS.values())
+  locations = {}
+
+  def place():
+    key = (state(), CITIES[city()])
+    if key not in locations:
+      locations[key] = locate(connection, key[1], key[0])
+    return locations[key]
+
+  def genres():
+    return array(sorted({genre() for _ in range(rng.choice((1, 1, 2, 2, 3)))}))
+
+  first_venue = next_id(connection, Venue)
+  venue_rows = []
+  for id in range(first_venue, first_venue + venues):
+    location_id, city_name, state_name = place()
+    venue_rows.append((id, f'Venue {id}', city_name, state_name, location_id, f'{id} Main Street',
+                       f'555-{id % 1000:03}-{id % 10000:04}', f'https://www.facebook.com/venue{id}',
+                       f'https://picsum.photos/seed/venue{id}/300', genres(), f'https://venue{id}.example.com',
+                       rng.random() < 0.4, ''))
+  copy_rows(connection, 'venue', ('id', 'name', 'city', 'state', 'location_id', 'address', 'phone',
+            'facebook_link', 'image_link', 'genres', 'website_link', 'seeking_talent',
+            'seeking_description'), venue_rows)
+
+  first_artist = next_id(connection, Artist)
+  artist_rows = []
+  for id in range(first_artist, first_artist + artists):
+    location_id, city_name, state_name = place()
+    artist_rows.append((id, f'Artist {id}', city_name, state_name, location_id,
+                        f'555-{id % 1000:03}-{id % 10000:04}', genres(), f'https://picsum.photos/seed/artist{id}/300',
+                        f'https://www.facebook.com/artist{id}', '', str(rng.random() < 0.3), ''))
+  copy_rows(connection, 'artist', ('id', 'name', 'city', 'state', 'location_id', 'phone', 'genres',
+            'image_link', 'facebook_link', 'website_link', 'seeking_venue', 'seeking_description'),
+            artist_rows)
+  for model in (Venue, Artist):
+    table = model.__tablename__
+    connection.execute(db.text(
+      f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), max(id)) FROM {table}"))
+
+  # a few venues and artists get most of the shows
+  venue = Weighted(rng, range(first_venue, first_venue + venues), zipf(venues))
+  artist = Weighted(rng, range(first_artist, first_artist + artists), zipf(artists))
+  start = (now - timedelta(days=730)).replace(hour=0)
+  slots = [start + timedelta(days=day, hours=hour) for day in range(1095) for hour in START_HOURS]
+  month = partitions.month_start(start)
+  while month <= slots[-1]:
+    connection.execute(db.select(db.func.show_partition(month)))
+    month = partitions.add_months(month, 1)
+
+  added = 0
+  def show_rows():
+    nonlocal added
+    # each slot gets its share of the shows, at distinct venues by distinct
+    # artists, so that none of them overlaps another
+    per_slot, extra = divmod(shows, len(slots))
+    # the remainder goes to slots picked across the whole range, so that a
+    # few shows still reach from the past into the future
+    extra_slots = set(rng.sample(range(len(slots)), extra))
+    for index, slot in enumerate(slots):
+      count = min(per_slot + (index in extra_slots), venues, artists)
+      added += count
+      for venue_id, artist_id in zip(venue.distinct(count), artist.distinct(count)):
+        yield artist_id, venue_id, slot, slot + timedelta(minutes=rng.choice(DURATIONS))
+  copy_rows(connection, 'show', ('artist_id', 'venue_id', 'start_time', 'end_time'), show_rows())
+  stats.rebuild(connection)
+  return venues, artists, added
@@ -0,0 +1,98 @@
+from datetime import datetime
+from sqlalchemy import case, event, func, inspect, literal
+from sqlalchemy.dialects.postgresql import insert
+from models import Venue, Artist, Show, VenueStats, ArtistStats, db
+#----------------------------------------------------------------------------#
+# Show statistics.
+#----------------------------------------------------------------------------#
+
+# A stats row counts the shows of its venue or artist that start at or before
+# counted_at as past and the later ones as upcoming. New shows are added to
+# the counts as they are flushed; shows deleted or moved make their rows be
+# recounted. Once next_show_time passes, the row is out of date until
+# roll_forward() recounts it -- until then queries.show_counts_statement()
+# counts that venue or artist from the show table instead.
+
+# (stats model, its key, counted model, show column of the key)
+TABLES = (
+  (VenueStats, VenueStats.venue_id, Venue, Show.venue_id),
+  (ArtistStats, ArtistStats.artist_id, Artist, Show.artist_id),
+)
+
+def add_show(connection, show, now):
+  """Add one new show to the stats rows of its venue and artist."""
+  start = show.start_time
+  for stats, key, _, show_key in TABLES:
+    past = start <= now
+    statement = insert(stats).values({
+      key: getattr(show, show_key.key),
+      stats.past_shows_count: int(past),
+      stats.upcoming_shows_count: int(not past),
+      stats.next_show_time: None if past else start,
+      stats.last_show_time: start if past else None,
+      stats.counted_at: now,
+    })
+    counted_past = stats.counted_at >= start
+    connection.execute(statement.on_conflict_do_update(index_elements=[key], set_={
+      'past_shows_count': stats.past_shows_count + case((counted_past, 1), else_=0),
+      'upcoming_shows_count': stats.upcoming_shows_count + case((counted_past, 0), else_=1),
+      'next_show_time': case((counted_past, stats.next_show_time),
+                             else_=func.least(stats.next_show_time, start)),
+      'last_show_time': case((counted_past, func.greatest(stats.last_show_time, start)),
+                             else_=stats.last_show_time),
+    }))
+
+def recount_statement(stats, key, model, show_key, now, where=None):
+  """Upsert freshly counted stats rows for the model rows matching where, or all of them."""
+  counts = db.select(
+    model.id,
+    func.count(Show.id).filter(Show.start_time <= now),
+    func.count(Show.id).filter(Show.start_time > now),
+    func.min(Show.start_time).filter(Show.start_time > now),
+    func.max(Show.start_time).filter(Show.start_time <= now),
+    literal(now, db.DateTime),
+  ).select_from(model).outerjoin(Show, show_key == model.id).group_by(model.id)
+  if where is not None:
+    counts = counts.where(where)
+  columns = ('past_shows_count', 'upcoming_shows_count', 'next_show_time', 'last_show_time', 'counted_at')
+  statement = insert(stats).from_select([key.key, *columns], counts)
+  return statement.on_conflict_do_update(index_elements=[key],
+    set_={column: statement.excluded[column] for column in columns})
+
+def recount(connection, venue_ids=(), artist_ids=(), now=None):
+  now = now or datetime.now()
+  for (stats, key, model, show_key), ids in zip(TABLES, (venue_ids, artist_ids)):
+    if ids:
+      connection.execute(recount_statement(stats, key, model, show_key, now, model.id.in_(ids)))
+
+def roll_forward(connection, now=None):
+  """Recount the rows whose next show has started; returns how many were recounted."""
+  now = now or datetime.now()
+  rolled = 0
+  for stats, key, model, show_key in TABLES:
+    due = db.select(key).where(stats.next_show_time <= now)
+    rolled += connection.execute(recount_statement(stats, key, model, show_key, now, model.id.in_(due))).rowcount
+  return rolled
+
+def rebuild(connection, now=None):
+  """Recount every venue and artist, e.g. after a bulk import."""
+  now = now or datetime.now()
+  for stats, key, model, show_key in TABLES:
+    connection.execute(recount_statement(stats, key, model, show_key, now))
+
+@event.listens_for(db.session, 'after_flush')
+def count_flushed_shows(session, flush_context):
+  now = datetime.now()
+  connection = session.connection()
+  venues, artists = set(), set()
+  for obj in session.new:
+    if isinstance(obj, Show):
+      add_show(connection, obj, now)
+  for obj in list(session.dirty) + list(session.deleted):
+    if not isinstance(obj, Show) or (obj in session.dirty and not session.is_modified(obj)):
+      continue
+    state = inspect(obj)
+    for ids, attr in ((venues, 'venue_id'), (artists, 'artist_id')):
+      history = state.attrs[attr].history
+      ids.update(id for id in (*history.unchanged, *history.added, *history.deleted) if id is not None)
+  recount(connection, venues, artists, now)
@@ -0,0 +1,37 @@
+import os
+import sys
+import pytest
+
+# the app's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import Venue, db
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def app():
+  """An app on an in-memory SQLite database, for views that need no tables."""
+  return create_app(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_ENGINE_OPTIONS={},
+    SQLALCHEMY_REPLICA_URIS=[], TESTING=True, PAGE_CACHE='none', QUERY_BUDGETS='raise')
+
+@pytest.fixture(scope='session')
+def database_app():
+  """An app on TEST_DATABASE_URL, a migrated Postgres database seeded if empty.
+
+  Tests that use it are skipped when TEST_DATABASE_URL is not set.
+  """
+  url = os.environ.get('TEST_DATABASE_URL')
+  if not url:
+    pytest.skip('TEST_DATABASE_URL is not set')
+  import seed
+  app = create_app(SQLALCHEMY_DATABASE_URI=url, LISTEN_DATABASE_URL=url, SQLALCHEMY_REPLICA_URIS=[],
+    TESTING=True, PAGE_CACHE='none', QUERY_BUDGETS='off', EXPORT_TOKEN='test')
+  with app.app_context():
+    if db.session.query(Venue.id).first() is None:
+      seed.generate(db.session.connection(), 20, 40, 400)
+      db.session.commit()
+  return app
@@ -0,0 +1,65 @@
+from areas import AreaIndex, group_areas
+
+ROWS = [
+  ('San Francisco', 'CA', 1, 'The Musical Hop'),
+  ('New York', 'NY', 2, 'The Dueling Pianos Bar'),
+  ('San Francisco', 'CA', 3, 'Park Square Live Music & Coffee'),
+]
+
+def loader(rows=ROWS):
+  calls = []
+  def load():
+    calls.append(1)
+    return rows
+  return load, calls
+
+def test_group_areas_folds_consecutive_rows():
+  assert group_areas([ROWS[0], ROWS[2], ROWS[1]]) == [
+    {'city': 'San Francisco', 'state': 'CA', 'venues': [
+      {'id': 1, 'name': 'The Musical Hop'}, {'id': 3, 'name': 'Park Square Live Music & Coffee'}]},
+    {'city': 'New York', 'state': 'NY', 'venues': [{'id': 2, 'name': 'The Dueling Pianos Bar'}]},
+  ]
+
+def test_listing_loads_once_and_orders_by_state_city_id():
+  index = AreaIndex()
+  load, calls = loader()
+  listing = index.listing(load)
+  assert [(area['state'], area['city']) for area in listing] == [('CA', 'San Francisco'), ('NY', 'New York')]
+  assert [venue['id'] for venue in listing[0]['venues']] == [1, 3]
+  assert index.listing(load) is listing
+  assert calls == [1]
+
+def test_warm_listing_never_loads():
+  index = AreaIndex()
+  assert index.warm_listing() is None
+  index.listing(loader()[0])
+  assert index.warm_listing() == index.listing(loader()[0])
+
+def test_put_and_remove_update_the_listing():
+  index = AreaIndex()
+  index.listing(loader()[0])
+  index.put(4, 'Blue Note', 'New York', 'NY')
+  index.put(1, 'The Musical Hop', 'Austin', 'TX')
+  index.remove(3)
+  assert index.warm_listing() == [
+    {'city': 'New York', 'state': 'NY', 'venues': [
+      {'id': 2, 'name': 'The Dueling Pianos Bar'}, {'id': 4, 'name': 'Blue Note'}]},
+    {'city': 'Austin', 'state': 'TX', 'venues': [{'id': 1, 'name': 'The Musical Hop'}]},
+  ]
+
+def test_changes_to_a_cold_index_are_left_to_the_load():
+  index = AreaIndex()
+  index.put(4, 'Blue Note', 'New York', 'NY')
+  index.remove(1)
+  load, calls = loader()
+  assert [venue['id'] for venue in index.listing(load)[0]['venues']] == [1, 3]
+  assert calls == [1]
+
+def test_invalidate_reloads():
+  index = AreaIndex()
+  load, calls = loader()
+  index.listing(load)
+  index.invalidate()
+  assert index.warm_listing() is None
+  index.listing(load)
+  assert calls == [1, 1]
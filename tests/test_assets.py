@@ -0,0 +1,79 @@
+import gzip
+import os
+import re
+import pytest
+from flask import Flask, url_for
+from assets import BUILD_DIR, MANIFEST, StaticAssets, build, hashed_name
+
+CSS = b'''.icon { background: url("../img/icon.png?v=2#top"); }
+.logo { background: url(/static/img/logo.png); }
+.font { src: url(data:font/woff;base64,AAAA); }
+.gone { background: url('../img/missing.png'); }
+'''
+
+@pytest.fixture
+def static(tmp_path):
+  for name, content in [('img/icon.png', b'\x89PNG icon'), ('css/main.css', CSS),
+                        ('js/app.js', b'var answer = 42;\n' * 100), ('js/lib.min.js', b'x' * 10)]:
+    path = tmp_path / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(content)
+  return tmp_path
+
+def built(static, manifest, name):
+  return (static / BUILD_DIR / manifest['files'][name]).read_bytes()
+
+def test_files_are_named_after_their_content(static):
+  manifest = build(str(static))
+  assert manifest['files']['img/icon.png'] == hashed_name('img/icon.png', b'\x89PNG icon')
+  assert built(static, manifest, 'img/icon.png') == b'\x89PNG icon'
+  assert (static / BUILD_DIR / MANIFEST).exists()
+
+def test_stylesheet_urls_name_the_hashed_files(static):
+  manifest = build(str(static))
+  css = built(static, manifest, 'css/main.css').decode()
+  icon = os.path.basename(manifest['files']['img/icon.png'])
+  assert f'url("../img/{icon}?v=2#top")' in css
+  # absolute, inline and unknown urls are left as they are
+  assert 'url(/static/img/logo.png)' in css
+  assert 'url(data:font/woff;base64,AAAA)' in css
+  assert "url('../img/missing.png')" in css
+  assert manifest['files']['css/main.css'] == hashed_name('css/main.css', css.encode())
+
+def test_only_compressible_files_that_shrink_get_variants(static):
+  manifest = build(str(static))
+  script = manifest['files']['js/app.js']
+  assert 'gzip' in manifest['compressed'][script]
+  assert gzip.decompress((static / BUILD_DIR / (script + '.gz')).read_bytes()) == built(static, manifest, 'js/app.js')
+  assert manifest['compressed'][manifest['files']['img/icon.png']] == []
+  assert manifest['compressed'][manifest['files']['js/lib.min.js']] == []
+
+def test_rebuild_skips_the_build_and_keeps_old_files(static):
+  first = build(str(static))
+  (static / 'js' / 'app.js').write_bytes(b'var answer = 43;\n')
+  second = build(str(static))
+  assert not any(name.startswith(BUILD_DIR) for name in second['files'])
+  assert second['files']['js/app.js'] != first['files']['js/app.js']
+  assert (static / BUILD_DIR / first['files']['js/app.js']).exists()
+
+def test_built_files_are_served_hashed_and_compressed(static):
+  manifest = build(str(static))
+  app = Flask(__name__, static_folder=str(static), static_url_path='/static')
+  StaticAssets(app)
+  script = f"{BUILD_DIR}/{manifest['files']['js/app.js']}"
+  with app.test_request_context():
+    assert url_for('static', filename='js/app.js') == f'/static/{script}'
+  response = app.test_client().get(f'/static/{script}', headers={'Accept-Encoding': 'gzip'})
+  assert response.content_encoding == 'gzip'
+  assert response.cache_control.immutable
+  assert gzip.decompress(response.data) == built(static, manifest, 'js/app.js')
+
+def test_without_a_build_static_is_served_as_it_is(static):
+  app = Flask(__name__, static_folder=str(static), static_url_path='/static')
+  StaticAssets(app)
+  with app.test_request_context():
+    assert url_for('static', filename='js/app.js') == '/static/js/app.js'
+
+def test_pages_load_no_assets_from_other_origins(app):
+  page = app.test_client().get('/').get_data(as_text=True)
+  assert re.findall(r'<(?:script|link)[^>]*(?:src|href)="(?:https?:)?//[^"]*', page) == []
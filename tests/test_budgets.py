@@ -0,0 +1,131 @@
+import logging
+import pytest
+from budgets import QueryBudgetExceeded, QueryCounter, budget, query_budget, shape
+from models import Show, db
+
+def limits(app, endpoint):
+  """(max_queries, max_repeats) of a view, as QueryBudgets reads them."""
+  max_queries, max_repeats = app.view_functions[endpoint].query_budget
+  return max_queries, max_repeats if max_repeats is not None else app.config['QUERY_REPEAT_LIMIT']
+
+def select_one():
+  db.session.execute(db.text('SELECT 1'))
+
+#----------------------------------------------------------------------------#
+# Counting.
+#----------------------------------------------------------------------------#
+
+def test_shape_collapses_whitespace_and_in_lists():
+  assert shape('SELECT a\n  FROM t WHERE id IN (%(id_1)s, %(id_2)s, %(id_3)s)') \
+    == 'SELECT a FROM t WHERE id IN (...)'
+  assert shape('SELECT a FROM t WHERE id IN (%(id_1)s)') == 'SELECT a FROM t WHERE id IN (...)'
+
+def test_query_budget_raises_over_budget(app):
+  with app.app_context():
+    with query_budget(2) as counter:
+      select_one()
+      select_one()
+    assert len(counter) == 2
+    with pytest.raises(QueryBudgetExceeded, match='3 queries, budget is 2'):
+      with query_budget(2):
+        for _ in range(3):
+          select_one()
+
+def test_query_budget_catches_repeats(app):
+  with app.app_context():
+    with pytest.raises(QueryBudgetExceeded, match='ran 3 times, at most 2 allowed'):
+      with query_budget(max_repeats=2):
+        for _ in range(3):
+          select_one()
+
+def test_uncounted_statements_are_skipped(app):
+  with app.app_context():
+    with QueryCounter() as counter:
+      db.session.execute(db.text('SELECT 1'), execution_options={'uncounted': True})
+      select_one()
+    assert len(counter) == 1
+
+#----------------------------------------------------------------------------#
+# Requests.
+#----------------------------------------------------------------------------#
+
+def test_every_view_has_a_budget(app):
+  missing = [endpoint for endpoint, view in app.view_functions.items()
+             if endpoint != 'static' and not hasattr(view, 'query_budget')]
+  assert missing == []
+
+@pytest.fixture
+def twice_app(app):
+  # a view that runs one statement more than its budget
+  @budget(1)
+  def twice():
+    select_one()
+    select_one()
+    return 'done'
+  app.add_url_rule('/twice', view_func=twice, methods=['GET', 'POST'])
+  return app
+
+def test_read_over_budget_fails(twice_app):
+  with pytest.raises(QueryBudgetExceeded, match=r'GET /twice \(twice\): 2 queries, budget is 1'):
+    twice_app.test_client().get('/twice')
+
+def test_write_over_budget_is_logged(twice_app, caplog):
+  with caplog.at_level(logging.WARNING):
+    response = twice_app.test_client().post('/twice')
+  assert response.status_code == 200
+  assert 'POST /twice (twice): 2 queries, budget is 1' in caplog.text
+
+def test_views_without_queries_keep_their_budget(app):
+  client = app.test_client()
+  for url, endpoint in [('/', 'pages.index'), ('/venues/create', 'pages.create_venue_form'),
+                        ('/artists/create', 'pages.create_artist_form'), ('/cache/stats', 'pages.cache_stats')]:
+    with query_budget(*limits(app, endpoint)):
+      assert client.get(url).status_code == 200
+
+#----------------------------------------------------------------------------#
+# Budgeted views, on a real database.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture(scope='session')
+def ids(database_app):
+  with database_app.app_context():
+    show = db.session.query(Show).order_by(Show.start_time.desc()).first()
+    return {'venue_id': show.venue_id, 'artist_id': show.artist_id, 'show_id': show.id}
+
+# (method, url, form, endpoint) of every view that reads the database
+BUDGETED_REQUESTS = [
+  ('GET', '/venues', None, 'pages.venues'),
+  ('GET', '/venues?genre=Jazz', None, 'pages.venues'),
+  ('POST', '/venues/search', {'search_term': 'the'}, 'pages.search_venues'),
+  ('GET', '/venues/{venue_id}', None, 'pages.show_venue'),
+  ('GET', '/venues/{venue_id}/shows/past', None, 'pages.more_venue_shows'),
+  ('GET', '/venues/{venue_id}/shows/upcoming', None, 'pages.more_venue_shows'),
+  ('GET', '/venues/{venue_id}/edit', None, 'pages.edit_venue'),
+  ('GET', '/artists', None, 'pages.artists'),
+  ('POST', '/artists/search', {'search_term': 'a'}, 'pages.search_artists'),
+  ('GET', '/artists/{artist_id}', None, 'pages.show_artist'),
+  ('GET', '/artists/{artist_id}/shows/past', None, 'pages.more_artist_shows'),
+  ('GET', '/artists/{artist_id}/shows/upcoming', None, 'pages.more_artist_shows'),
+  ('GET', '/artists/{artist_id}/edit', None, 'pages.edit_artist'),
+  ('GET', '/shows', None, 'pages.shows'),
+  ('GET', '/shows/create', None, 'pages.create_shows'),
+  ('GET', '/export/show.csv', None, 'pages.export'),
+  ('GET', '/pool/stats', None, 'pages.pool_stats'),
+  ('GET', '/api/v1/venues', None, 'api.venues'),
+  ('GET', '/api/v1/venues/{venue_id}', None, 'api.venue'),
+  ('GET', '/api/v1/artists', None, 'api.artists'),
+  ('GET', '/api/v1/artists/{artist_id}', None, 'api.artist'),
+  ('GET', '/api/v1/shows', None, 'api.shows'),
+  ('GET', '/api/v1/shows/{show_id}', None, 'api.show'),
+  ('GET', '/api/v1/availability?venue_id={venue_id}&start=2030-05-21T21:30', None, 'api.availability'),
+]
+
+@pytest.mark.parametrize('method, url, form, endpoint', BUDGETED_REQUESTS)
+def test_view_stays_within_budget(database_app, ids, method, url, form, endpoint):
+  client = database_app.test_client()
+  with query_budget(*limits(database_app, endpoint)):
+    response = client.open(url.format(**ids), method=method, data=form,
+                           headers={'Authorization': 'Bearer test'})
+    # streamed pages run their queries as they are read
+    response.get_data()
+  assert response.status_code == 200
@@ -0,0 +1,78 @@
+import io
+from datetime import datetime
+import pytest
+from importer import read_rows, validate
+
+VENUE = {
+  'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street',
+  'phone': '123-123-1234', 'genres': ['Jazz', 'Folk'], 'facebook_link': 'https://www.facebook.com/TheMusicalHop',
+}
+SHOW = {'artist_id': '4', 'venue_id': '1', 'start_time': '2030-05-21 21:30:00'}
+
+@pytest.fixture
+def context(app):
+  with app.app_context():
+    yield
+
+#----------------------------------------------------------------------------#
+# Reading.
+#----------------------------------------------------------------------------#
+
+def test_read_csv_numbers_lines_and_splits_genres():
+  stream = io.StringIO('name,genres\nThe Musical Hop,Jazz;Folk;\nBlue Note,\n')
+  assert list(read_rows(stream, 'csv')) == [
+    (2, {'name': 'The Musical Hop', 'genres': ['Jazz', 'Folk']}),
+    (3, {'name': 'Blue Note', 'genres': []}),
+  ]
+
+def test_read_ndjson_skips_blank_lines_and_flags_bad_json():
+  stream = io.StringIO('{"name": "The Musical Hop"}\n\n{"name": \n["Blue Note"]\n')
+  assert list(read_rows(stream, 'ndjson')) == [
+    (1, {'name': 'The Musical Hop'}),
+    (3, None),
+    (4, ['Blue Note']),
+  ]
+
+#----------------------------------------------------------------------------#
+# Validation.
+#----------------------------------------------------------------------------#
+
+def test_valid_venue(context):
+  values, errors = validate('venue', dict(VENUE, id='12', seeking_talent='no'))
+  assert errors is None
+  assert values['id'] == 12
+  assert values['genres'] == ['Jazz', 'Folk']
+  assert values['seeking_talent'] is False
+
+@pytest.mark.parametrize('spelling, seeking', [('yes', True), ('y', True), ('True', True),
+                                               ('false', False), ('N', False), ('0', False), (None, False)])
+def test_checkbox_spellings(context, spelling, seeking):
+  values, _ = validate('venue', dict(VENUE, seeking_talent=spelling))
+  assert values['seeking_talent'] is seeking
+
+def test_invalid_venue_reports_form_errors(context):
+  values, errors = validate('venue', dict(VENUE, state='XX', id='x'))
+  assert values is None
+  assert 'state' in errors
+  assert validate('venue', dict(VENUE, id='x')) == (None, {'id': ['Not an id.']})
+
+def test_row_that_is_not_an_object(context):
+  assert validate('venue', ['The Musical Hop']) == (None, {'row': ['Not a JSON object.']})
+
+def test_show_end_time_from_duration(context):
+  values, errors = validate('show', dict(SHOW, duration='90'))
+  assert errors is None
+  assert values == {'artist_id': 4, 'venue_id': 1, 'start_time': datetime(2030, 5, 21, 21, 30),
+                    'end_time': datetime(2030, 5, 21, 23, 0)}
+
+def test_show_end_time_from_export(context):
+  values, _ = validate('show', dict(SHOW, end_time='2030-05-21T22:00:00'))
+  assert values['end_time'] == datetime(2030, 5, 21, 22, 0)
+
+@pytest.mark.parametrize('changes, errors', [
+  ({'end_time': '2030-05-21T20:00:00'}, {'end_time': ['Not after start_time.']}),
+  ({'end_time': 'later'}, {'end_time': ['Not a date and time.']}),
+  ({'artist_id': 'x'}, {'artist_id/venue_id': ['Not an id.']}),
+])
+def test_invalid_show(context, changes, errors):
+  assert validate('show', dict(SHOW, **changes)) == (None, errors)
@@ -0,0 +1,30 @@
+from collections import namedtuple
+from datetime import datetime
+import pytest
+from queries import decode_cursor, encode_cursor, keyset_result
+
+Row = namedtuple('Row', 'id start_time')
+
+def test_cursor_round_trip():
+  start_time = datetime(2030, 5, 21, 21, 30)
+  assert decode_cursor(encode_cursor(start_time, 42)) == (start_time, 42)
+
+def test_cursor_keeps_microseconds():
+  start_time = datetime(2030, 5, 21, 21, 30, 15, 250)
+  assert decode_cursor(encode_cursor(start_time, 7)) == (start_time, 7)
+
+@pytest.mark.parametrize('cursor', ['', '42', '2030-05-21T21:30', '2030-05-21T21:30_', 'soon_42',
+                                    '2030-05-21T21:30_x'])
+def test_bad_cursor_raises_value_error(cursor):
+  with pytest.raises(ValueError):
+    decode_cursor(cursor)
+
+def test_keyset_result_cursor_points_at_the_last_row():
+  rows = [Row(id, datetime(2030, 5, day)) for id, day in [(3, 1), (1, 2), (2, 2)]]
+  page, next_cursor = keyset_result(rows, 2)
+  assert page == rows[:2]
+  assert decode_cursor(next_cursor) == (datetime(2030, 5, 2), 1)
+
+def test_keyset_result_last_page_has_no_cursor():
+  rows = [Row(1, datetime(2030, 5, 1))]
+  assert keyset_result(rows, 1) == (rows, None)
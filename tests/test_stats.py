@@ -0,0 +1,60 @@
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+import stats
+from models import VenueStats, ArtistStats, db
+
+JAN = datetime(2030, 1, 1)
+FEB = datetime(2030, 2, 1)
+MAR = datetime(2030, 3, 1)
+
+def ignoring_nulls(pick):
+  # least() and greatest() as Postgres has them, for SQLite
+  return lambda *values: pick((value for value in values if value is not None), default=None)
+
+@pytest.fixture
+def connection(app):
+  # the upserts are Postgres INSERT .. ON CONFLICT, which SQLite runs as well
+  with app.app_context():
+    with db.engine.connect() as connection:
+      VenueStats.__table__.create(connection)
+      ArtistStats.__table__.create(connection)
+      connection.connection.create_function('least', 2, ignoring_nulls(min))
+      connection.connection.create_function('greatest', 2, ignoring_nulls(max))
+      yield connection
+
+def add_show(connection, start_time, now):
+  stats.add_show(connection, SimpleNamespace(start_time=start_time, venue_id=1, artist_id=2), now)
+
+def stats_row(connection, model=VenueStats):
+  row = connection.execute(db.select(
+    model.past_shows_count, model.upcoming_shows_count, model.next_show_time, model.last_show_time,
+    model.counted_at)).one()
+  return tuple(row)
+
+def test_first_show_creates_the_rows(connection):
+  add_show(connection, FEB, JAN)
+  assert stats_row(connection) == (0, 1, FEB, None, JAN)
+  assert stats_row(connection, ArtistStats) == (0, 1, FEB, None, JAN)
+
+def test_first_past_show(connection):
+  add_show(connection, JAN, FEB)
+  assert stats_row(connection) == (1, 0, None, JAN, FEB)
+
+def test_shows_are_counted_relative_to_counted_at(connection):
+  add_show(connection, MAR, JAN)
+  # started before now, but after the row was counted: upcoming, as far as
+  # the row goes, until roll_forward() recounts it
+  add_show(connection, FEB, MAR)
+  assert stats_row(connection) == (0, 2, FEB, None, JAN)
+
+def test_show_before_counted_at_is_past(connection):
+  add_show(connection, MAR, FEB)
+  add_show(connection, JAN, MAR)
+  add_show(connection, datetime(2029, 12, 1), MAR)
+  assert stats_row(connection) == (2, 1, MAR, JAN, FEB)
+
+def test_show_at_counted_at_is_past(connection):
+  add_show(connection, MAR, FEB)
+  add_show(connection, FEB, MAR)
+  assert stats_row(connection) == (1, 1, MAR, FEB, FEB)